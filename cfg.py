@@ -0,0 +1,265 @@
+from symbol_table import SymbolTable
+
+JUMP_OPERATORS = ("jump", "jump_zero")
+BLOCK_ENDING_OPERATORS = ("jump", "jump_zero", "halt")
+
+# the operators which read their destination field instead of writing it
+DESTINATION_READING_OPERATORS = ("OUTPUT",)
+
+# the instruction type of a comparison is the type of its operands, its result is always an integer
+COMPARISON_OPERATORS = ("==", "!=", "<", ">")
+
+
+def is_variable(operand):
+    # the immediate operands are numbers (or numeric strings), and the empty string marks a missing operand
+    return isinstance(operand, str) and operand[:1].isalpha()
+
+def get_defined_variable(instruction):
+    if instruction.operator in JUMP_OPERATORS or instruction.operator in DESTINATION_READING_OPERATORS:
+        return None
+
+    return instruction.destination if is_variable(instruction.destination) else None
+
+def get_defined_type(instruction):
+    return SymbolTable.Types.INT if instruction.operator in COMPARISON_OPERATORS else instruction.type
+
+def get_used_variables(instruction):
+    if instruction.operator in JUMP_OPERATORS:
+        operands = [instruction.first_operand]
+    elif instruction.operator in DESTINATION_READING_OPERATORS:
+        operands = [instruction.destination]
+    else:
+        operands = [instruction.first_operand, instruction.second_operarnd]
+
+    return [operand for operand in operands if is_variable(operand)]
+
+
+class BasicBlock:
+    def __init__(self, index):
+        self.index = index
+        self.instructions = []
+        self.successors = []
+        self.predecessors = []
+
+    @property
+    def last_instruction(self):
+        return self.instructions[-1] if self.instructions else None
+
+class Loop:
+    def __init__(self, header):
+        # the header is the only entry of a natural loop, blocks are the indices of the blocks in the loop (including the header)
+        self.header = header
+        self.blocks = {header.index}
+
+class ControlFlowGraph:
+    def __init__(self, ir):
+        self.blocks = []
+        self._split_blocks(ir)
+        self._link_blocks()
+
+    def _split_blocks(self, ir):
+        # a block starts at a label or after an instruction which transfers the control
+        current_block = None
+
+        for instruction in ir:
+            if current_block is None or instruction.operator == "label" or current_block.last_instruction.operator in BLOCK_ENDING_OPERATORS:
+                current_block = BasicBlock(len(self.blocks))
+                self.blocks.append(current_block)
+
+            current_block.instructions.append(instruction)
+
+    def _link_blocks(self):
+        labels_blocks = {
+            block.instructions[0].destination: block for block in self.blocks if block.instructions[0].operator == "label"
+        }
+
+        for block in self.blocks:
+            last_instruction = block.last_instruction
+
+            if last_instruction.operator in JUMP_OPERATORS:
+                block.successors.append(labels_blocks[last_instruction.destination])
+
+            # every block but the ones ending with an unconditional transfer falls through to the next block
+            if last_instruction.operator not in ("jump", "halt") and block.index + 1 < len(self.blocks):
+                next_block = self.blocks[block.index + 1]
+                if next_block not in block.successors:
+                    block.successors.append(next_block)
+
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def get_ir(self):
+        return [instruction for block in self.blocks for instruction in block.instructions]
+
+    def compute_liveness(self):
+        # returns the variables which are live at the end of every block, by the classic backwards data-flow iteration
+        blocks_uses = []
+        blocks_definitions = []
+
+        for block in self.blocks:
+            uses = set()
+            definitions = set()
+
+            for instruction in block.instructions:
+                # only the variables which are read before being written in the block are live at its start
+                uses.update(variable for variable in get_used_variables(instruction) if variable not in definitions)
+
+                defined_variable = get_defined_variable(instruction)
+                if defined_variable:
+                    definitions.add(defined_variable)
+
+            blocks_uses.append(uses)
+            blocks_definitions.append(definitions)
+
+        live_in = [set() for _ in self.blocks]
+        live_out = [set() for _ in self.blocks]
+
+        changed = True
+        while changed:
+            changed = False
+
+            for block in reversed(self.blocks):
+                block_live_out = set()
+                for successor in block.successors:
+                    block_live_out |= live_in[successor.index]
+
+                block_live_in = blocks_uses[block.index] | (block_live_out - blocks_definitions[block.index])
+
+                if block_live_in != live_in[block.index] or block_live_out != live_out[block.index]:
+                    live_in[block.index] = block_live_in
+                    live_out[block.index] = block_live_out
+                    changed = True
+
+        return live_out
+
+    def get_reachable_blocks(self):
+        # the blocks which are reachable from the entry block, in their original order
+        reachable = set()
+        pending = self.blocks[:1]
+
+        while pending:
+            block = pending.pop()
+
+            if block.index not in reachable:
+                reachable.add(block.index)
+                pending.extend(block.successors)
+
+        return [block for block in self.blocks if block.index in reachable]
+
+    def get_live_in(self, block, live_out):
+        # the variables which are live at the start of the block
+        live = set(live_out[block.index])
+
+        for instruction in reversed(block.instructions):
+            live.discard(get_defined_variable(instruction))
+            live.update(get_used_variables(instruction))
+
+        return live
+
+    def get_reverse_postorder(self):
+        # the blocks which are reachable from the entry block, in the reverse postorder of a depth first search (without recursion)
+        if not self.blocks:
+            return []
+
+        postorder = []
+        visited = {0}
+        pending = [(self.blocks[0], iter(self.blocks[0].successors))]
+
+        while pending:
+            block, successors = pending[-1]
+
+            for successor in successors:
+                if successor.index not in visited:
+                    visited.add(successor.index)
+                    pending.append((successor, iter(successor.successors)))
+                    break
+            else:
+                pending.pop()
+                postorder.append(block)
+
+        postorder.reverse()
+        return postorder
+
+    def has_backward_edges(self):
+        # every cycle has an edge to a block which is not after its source, so a graph without such edges has no loops
+        return any(successor.index <= block.index for block in self.blocks for successor in block.successors)
+
+    def find_loops(self, dominator_tree):
+        # every edge to a dominating block closes a natural loop, which contains the blocks reaching the edge without passing the header
+        loops = {}
+
+        for block in self.blocks:
+            for successor in block.successors:
+                if dominator_tree.dominates(successor.index, block.index):
+                    loop = loops.setdefault(successor.index, Loop(successor))
+                    pending = [block]
+
+                    while pending:
+                        loop_block = pending.pop()
+
+                        if loop_block.index not in loop.blocks:
+                            loop.blocks.add(loop_block.index)
+                            pending.extend(loop_block.predecessors)
+
+        return list(loops.values())
+
+class DominatorTree:
+    def __init__(self, control_flow_graph):
+        # the immediate dominator of every block (None for the unreachable blocks) by the algorithm of Cooper, Harvey and Kennedy,
+        #   so the dominators take memory linear in the number of blocks instead of a set of dominators for every block
+        order = control_flow_graph.get_reverse_postorder()
+        order_numbers = {block.index: number for number, block in enumerate(order)}
+
+        self.immediate_dominators = [None] * len(control_flow_graph.blocks)
+        self.depths = [0] * len(control_flow_graph.blocks)
+
+        if not order:
+            return
+
+        immediate_dominators = self.immediate_dominators
+        immediate_dominators[order[0].index] = order[0].index
+
+        changed = True
+        while changed:
+            changed = False
+
+            for block in order[1:]:
+                immediate_dominator = None
+
+                for predecessor in block.predecessors:
+                    if immediate_dominators[predecessor.index] is None:
+                        continue
+
+                    if immediate_dominator is None:
+                        immediate_dominator = predecessor.index
+                    else:
+                        immediate_dominator = self._intersect(predecessor.index, immediate_dominator, order_numbers)
+
+                if immediate_dominators[block.index] != immediate_dominator:
+                    immediate_dominators[block.index] = immediate_dominator
+                    changed = True
+
+        # the immediate dominator of a block comes before it in the reverse postorder
+        for block in order[1:]:
+            self.depths[block.index] = self.depths[immediate_dominators[block.index]] + 1
+
+    def _intersect(self, first_index, second_index, order_numbers):
+        # the nearest common dominator, by walking up from the block which is later in the reverse postorder
+        while first_index != second_index:
+            while order_numbers[first_index] > order_numbers[second_index]:
+                first_index = self.immediate_dominators[first_index]
+
+            while order_numbers[second_index] > order_numbers[first_index]:
+                second_index = self.immediate_dominators[second_index]
+
+        return first_index
+
+    def dominates(self, dominator_index, block_index):
+        # an unreachable block neither dominates nor is dominated
+        if self.immediate_dominators[dominator_index] is None or self.immediate_dominators[block_index] is None:
+            return False
+
+        while self.depths[block_index] > self.depths[dominator_index]:
+            block_index = self.immediate_dominators[block_index]
+
+        return block_index == dominator_index
@@ -36,4 +36,8 @@ TOKEN_NAME_TYPE_FLOAT       = "FLOAT"
 TOKEN_NAME_NUM              = "NUM"
 
 # Others
-GRAMMAR_FILE_PATH           = "cpl.lark"
\ No newline at end of file
+GRAMMAR_FILE_PATH           = "cpl.lark"
+STANDALONE_PARSER_MODULE    = "cpl_parser"
+STANDALONE_PARSER_FILE_PATH = "cpl_parser.py"
+CACHE_DIRECTORY_NAME        = "cpq"
+SOURCE_ENCODING             = "utf-8"
\ No newline at end of file
@@ -1,31 +1,50 @@
 
+import argparse
+import mmap
 import os
 import sys
 from consts import *
 from custom_parser import Parser
-from ir import get_ir
-from lexer import MatchedToken, PatternToken, Tokenizer
+from ir import CPLSyntaxDirectedTranslator, get_ir, get_program_ir
+from optimizer import coalesce_temporaries, eliminate_dead_stores, fold_constants, hoist_loop_invariants, number_values, remove_unreachable_blocks
+from lexer import IdentifierPatternToken, MatchedToken, PatternToken, Tokenizer
 from quad import get_quad
 from symbol_table import SymbolTable
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python cpq.py <path-to-cpl-source>")
-        exit(-1)
-    
-    input_file_path = sys.argv[1]
+    argument_parser = argparse.ArgumentParser(description="Compiles CPL source code to Quad code")
+    argument_parser.add_argument("source", help="path to the CPL source")
+    argument_parser.add_argument("-m", "--mmap", action="store_true",
+                                 help="memory-map the source instead of reading it into memory")
+    argument_parser.add_argument("-s", "--syntax-directed", action="store_true",
+                                 help="build the IR while parsing, without building a parse tree")
+    argument_parser.add_argument("-c", "--short-circuit", action="store_true",
+                                 help="lower the conditions to jumps which stop evaluating a condition once its result is known")
+    argument_parser.add_argument("-O", "--optimize", action="store_true",
+                                 help="optimize the IR: fold the constants, remove the unreachable code, number the values, hoist the loop invariants and remove the dead stores")
+    argument_parser.add_argument("--stats", action="store_true",
+                                 help="print the optimizations statistics to stderr")
+
+    args = argument_parser.parse_args()
+
+    input_file_path = args.source
     input_file_no_ext = os.path.splitext(input_file_path)[0]
     output_file_path = "{}.qud".format(input_file_no_ext)
 
-    with open(input_file_path, "r") as input_file:
-        source = input_file.read()
-        errors, result = compile(source)
+    with open(input_file_path, "rb" if args.mmap else "r") as input_file:
+        source = map_source(input_file) if args.mmap else input_file.read()
+        statistics = {}
+        errors, result = compile(source, syntax_directed=args.syntax_directed, optimize=args.optimize, short_circuit=args.short_circuit,
+                                 statistics=statistics)
+
+        if isinstance(source, mmap.mmap):
+            source.close()
 
         if not errors:
             with open(output_file_path, "w") as output_file:
-                for instruction in result:
-                    output_file.write(instruction.code)
+                for line in result.lines():
+                    output_file.write(line)
                     output_file.write('\n')
                 output_file.write("Enosh Zerahia")
         else:
@@ -34,17 +53,34 @@ def main():
             
             print("Enosh Zerahia")
 
+    if args.stats:
+        for name, value in statistics.items():
+            print("{name}: {value}".format(name=name, value=value), file=sys.stderr)
+
+
+def map_source(input_file):
+    # the lexer scans the mapped file directly, so the source is never copied into memory
+    if os.fstat(input_file.fileno()).st_size == 0:
+        # an empty file cannot be memory-mapped
+        return memoryview(b"")
+
+    return mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
 
-def compile(input):
-    parser = None
+
+def compile(input, syntax_directed=False, optimize=False, short_circuit=False, statistics=None):
+    grammar = None
     with open(GRAMMAR_FILE_PATH, "r") as grammar_file:
-        parser = Parser(grammar_file.read())
+        grammar = grammar_file.read()
 
     lexer = Tokenizer()
     add_cpl_symbols(lexer)
 
-    tokens = lexer.tokenize(input)
+    tokens = lexer.tokenize_stream(input)
+
+    if syntax_directed:
+        return compile_syntax_directed(grammar, tokens, optimize, short_circuit, statistics)
 
+    parser = Parser(grammar)
     errors, ast = parser.parse(tokens)
     
     if errors:
@@ -55,27 +91,73 @@ def compile(input):
     if errors:
         return errors, []
     
-    errors, ir = get_ir(ast, symbol_table)
+    errors, ir = get_ir(ast, symbol_table, short_circuit)
 
     if errors:
         return errors, []
 
-    quad = get_quad(ir)
+    quad = generate_quad(ir, symbol_table, optimize, statistics)
     
     return [], quad
 
 
-def add_cpl_symbols(lexer):
-    lexer.add_token(PatternToken("break", lambda _: MatchedToken(TOKEN_NAME_BREAK, "break", "")))
-    lexer.add_token(PatternToken("case", lambda _: MatchedToken(TOKEN_NAME_CASE, "case", "")))
-    lexer.add_token(PatternToken("default", lambda _: MatchedToken(TOKEN_NAME_DEFAULT, "default", "")))
-    lexer.add_token(PatternToken("else", lambda _: MatchedToken(TOKEN_NAME_ELSE, "else", "")))
-    lexer.add_token(PatternToken("if", lambda _: MatchedToken(TOKEN_NAME_IF, "if", "")))
-    lexer.add_token(PatternToken("input", lambda _: MatchedToken(TOKEN_NAME_INPUT, "input", "")))
-    lexer.add_token(PatternToken("output", lambda _: MatchedToken(TOKEN_NAME_OUTPUT, "output", "")))
-    lexer.add_token(PatternToken("switch", lambda _: MatchedToken(TOKEN_NAME_SWITCH, "switch", "")))
-    lexer.add_token(PatternToken("while", lambda _: MatchedToken(TOKEN_NAME_WHILE, "while", "")))
+def compile_syntax_directed(grammar, tokens, optimize=False, short_circuit=False, statistics=None):
+    # the symbol table and the IR are built by the parser reductions, so the parse tree is never built
+    symbol_table = SymbolTable()
+    translator = CPLSyntaxDirectedTranslator(symbol_table, short_circuit)
+    parser = Parser(grammar, transformer=translator)
+
+    errors, ir_tree = parser.parse(tokens)
+
+    if errors:
+        return errors, []
+
+    if translator.symbol_table_errors:
+        return translator.symbol_table_errors, []
+
+    errors, ir = get_program_ir(translator, ir_tree)
+
+    if errors:
+        return errors, []
 
+    quad = generate_quad(ir, symbol_table, optimize, statistics)
+
+    return [], quad
+
+
+def generate_quad(ir, symbol_table, optimize=False, statistics=None):
+    # the optimization passes over the IR, followed by the quad code generation
+    if statistics is not None:
+        statistics["instructions before optimization"] = sum(1 for instruction in ir if instruction.operator != "label")
+
+    if optimize:
+        ir, folded_instructions = fold_constants(ir)
+        ir, unreachable_instructions = remove_unreachable_blocks(ir)
+        ir, numbered_instructions = number_values(ir)
+        ir, hoisted_instructions = hoist_loop_invariants(ir)
+        ir, dead_stores = eliminate_dead_stores(ir)
+
+        if statistics is not None:
+            statistics["folded instructions"] = folded_instructions
+            statistics["removed unreachable instructions"] = unreachable_instructions
+            statistics["value numbered instructions"] = numbered_instructions
+            statistics["hoisted loop invariants"] = hoisted_instructions
+            statistics["removed dead stores"] = dead_stores
+
+    ir, saved_temporaries = coalesce_temporaries(ir, symbol_table)
+
+    if statistics is not None:
+        statistics["saved temporary variables"] = saved_temporaries
+
+    quad = get_quad(ir)
+
+    if statistics is not None:
+        statistics["instructions after optimization"] = len(quad)
+
+    return quad
+
+
+def add_cpl_symbols(lexer):
     lexer.add_token(PatternToken(r"(==|!=|>=|<=|>|<)",  lambda matched_string: MatchedToken(TOKEN_NAME_RELOP, matched_string, matched_string)))
     lexer.add_token(PatternToken(r"(\+|-){1}", lambda matched_string: MatchedToken(TOKEN_NAME_ADDOP, matched_string, matched_string)))
     lexer.add_token(PatternToken(r"(\*|\/){1}", lambda matched_string: MatchedToken(TOKEN_NAME_MULOP, matched_string, matched_string)))
@@ -96,9 +178,23 @@ def add_cpl_symbols(lexer):
     lexer.add_token(PatternToken(r"static_cast<(int|float)>", \
         lambda matched_string: MatchedToken(TOKEN_NAME_CAST, matched_string, SymbolTable.Types.INT if matched_string.find("int") != -1 else SymbolTable.Types.FLOAT)))
 
-    lexer.add_token(PatternToken("int", lambda _: MatchedToken(TOKEN_NAME_TYPE_INT, "int", "")))
-    lexer.add_token(PatternToken("float", lambda _: MatchedToken(TOKEN_NAME_TYPE_FLOAT, "float", "")))
-    lexer.add_token(PatternToken(r"[a-zA-Z][a-zA-Z0-9]*", lambda matched_string: MatchedToken(TOKEN_NAME_ID, matched_string, matched_string)))
+    # keywords and types are matched as identifiers and then classified by the reserved words table
+    identifier_token = IdentifierPatternToken(r"[a-zA-Z][a-zA-Z0-9]*", lambda matched_string: MatchedToken(TOKEN_NAME_ID, matched_string, matched_string))
+
+    identifier_token.add_reserved_word("break", lambda _: MatchedToken(TOKEN_NAME_BREAK, "break", ""))
+    identifier_token.add_reserved_word("case", lambda _: MatchedToken(TOKEN_NAME_CASE, "case", ""))
+    identifier_token.add_reserved_word("default", lambda _: MatchedToken(TOKEN_NAME_DEFAULT, "default", ""))
+    identifier_token.add_reserved_word("else", lambda _: MatchedToken(TOKEN_NAME_ELSE, "else", ""))
+    identifier_token.add_reserved_word("if", lambda _: MatchedToken(TOKEN_NAME_IF, "if", ""))
+    identifier_token.add_reserved_word("input", lambda _: MatchedToken(TOKEN_NAME_INPUT, "input", ""))
+    identifier_token.add_reserved_word("output", lambda _: MatchedToken(TOKEN_NAME_OUTPUT, "output", ""))
+    identifier_token.add_reserved_word("switch", lambda _: MatchedToken(TOKEN_NAME_SWITCH, "switch", ""))
+    identifier_token.add_reserved_word("while", lambda _: MatchedToken(TOKEN_NAME_WHILE, "while", ""))
+
+    identifier_token.add_reserved_word("int", lambda _: MatchedToken(TOKEN_NAME_TYPE_INT, "int", ""))
+    identifier_token.add_reserved_word("float", lambda _: MatchedToken(TOKEN_NAME_TYPE_FLOAT, "float", ""))
+
+    lexer.add_token(identifier_token)
 
     lexer.add_token(PatternToken(r"\d+", lambda matched_string: MatchedToken(TOKEN_NAME_NUM, matched_string, int(matched_string))))
     lexer.add_token(PatternToken(r"\d+\.\d+", lambda matched_string: MatchedToken(TOKEN_NAME_NUM, matched_string, float(matched_string))))
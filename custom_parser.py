@@ -1,39 +1,223 @@
-from collections import namedtuple
-from lark import Lark, UnexpectedToken
-from lark.lexer import Lexer, Token
+import hashlib
+import importlib
+import os
+import stat
+import sys
+import threading
 
 from exceptions import CPLException
 from lexer import InvalidTokenException
-from consts import TOKEN_NAME_INVALID_TOKEN
-
-class TypeLexer(Lexer):
-    def __init__(self, *args, **kwargs):
-        Lexer.__init__(self)
-    
-    def lex(self, data):
-        for token, line_number in data:
-            if token.name == TOKEN_NAME_INVALID_TOKEN:
-                continue
-            else:
-                yield Token(token.name, value=token.attributes, line=line_number)
+from consts import (
+    CACHE_DIRECTORY_NAME, GRAMMAR_FILE_PATH, STANDALONE_PARSER_MODULE, TOKEN_NAME_CASE, TOKEN_NAME_DEFAULT, TOKEN_NAME_INVALID_TOKEN, TOKEN_NAME_LEFT_BRCKT,
+    TOKEN_NAME_RIGHT_BRCKT, TOKEN_NAME_SEMICOLON
+)
+
+# the tokens which end a statement or a declaration (or start a block), the parser resumes at them when it recovers from a syntax error
+SYNCHRONIZING_TOKENS = {TOKEN_NAME_SEMICOLON, TOKEN_NAME_LEFT_BRCKT, TOKEN_NAME_RIGHT_BRCKT}
+
+# the tokens which may follow a list of statements (the end of a block, or of a case of a switch)
+STATEMENT_LIST_FOLLOWING_TOKENS = {TOKEN_NAME_RIGHT_BRCKT, TOKEN_NAME_CASE, TOKEN_NAME_DEFAULT}
+
+# the number of tokens to be accepted after a recovery before reporting another syntax error, to avoid cascading errors
+RECOVERY_ACCEPTED_TOKENS = 3
+
+# bump when generate_parser.py changes the generated module, so modules generated by an older version are not loaded
+STANDALONE_PARSER_VERSION = 2
+
+def grammar_digest(grammar):
+    return hashlib.sha256(grammar.encode()).hexdigest()
+
+def standalone_parser_digest(grammar):
+    return hashlib.sha256("{}\n{}".format(STANDALONE_PARSER_VERSION, grammar).encode()).hexdigest()
+
+def get_private_cache_directory():
+    # the cached parse tables are unpickled, so they are kept only in a directory of the current user which no other user can write to
+    cache_directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), CACHE_DIRECTORY_NAME)
+
+    try:
+        if not os.path.lexists(cache_directory):
+            os.makedirs(cache_directory, 0o700)
+
+        status = os.lstat(cache_directory)
+    except OSError:
+        return None
+
+    if not stat.S_ISDIR(status.st_mode):
+        return None
+
+    if hasattr(os, "getuid") and (status.st_uid != os.getuid() or status.st_mode & 0o077):
+        return None
+
+    return cache_directory
+
+def get_lark_cache_path(grammar):
+    # the parse tables are cached by the grammar, the Lark version and the Python version, or not at all without a private directory
+    cache_directory = get_private_cache_directory()
+    if not cache_directory:
+        return False
+
+    import lark
+
+    return os.path.join(cache_directory, "lark_{}_{}_{}.{}.pickle".format(grammar_digest(grammar), lark.__version__, *sys.version_info[:2]))
+
+def load_standalone_parser():
+    # the generated parser module (see generate_parser.py) is used only if it was generated from the current grammar
+    #   by the current version of the generator
+    try:
+        standalone_parser = importlib.import_module(STANDALONE_PARSER_MODULE)
+
+        with open(GRAMMAR_FILE_PATH, "r") as grammar_file:
+            if standalone_parser_digest(grammar_file.read()) != getattr(standalone_parser, "GRAMMAR_DIGEST", None):
+                return None
+    except (ImportError, OSError):
+        return None
+
+    return standalone_parser
+
+standalone_parser = load_standalone_parser()
+
+# the tree classes must come from the same module as the parser that builds the trees
+if standalone_parser:
+    Token, Transformer_NonRecursive, Tree, UnexpectedToken, Visitor = (
+        standalone_parser.Token, standalone_parser.Transformer_NonRecursive, standalone_parser.Tree, standalone_parser.UnexpectedToken,
+        standalone_parser.Visitor
+    )
+else:
+    from lark import Token, Transformer_NonRecursive, Tree, UnexpectedToken, Visitor
 
 class Parser:
-    def __init__(self, grammar):
-        self.parser = Lark(grammar, parser='lalr', lexer=TypeLexer)
-    
-    def parse(self, token_list):
-        errors = [
-            InvalidTokenException(line_number, token) for token, line_number in token_list if token.name == TOKEN_NAME_INVALID_TOKEN
-        ]
-        
+    # the built parsers are shared by every instance in the process, keyed by the grammar
+    lark_parsers = {}
+    lark_parsers_lock = threading.Lock()
+
+    def __init__(self, grammar, transformer=None):
+        if transformer:
+            # the transformer is applied on every reduction instead of building a tree,
+            #   it is bound to the parser so such a parser cannot be shared
+            self.parser = self._build_parser(grammar, transformer)
+        else:
+            # the parser is built only once even if several threads create it concurrently
+            with Parser.lark_parsers_lock:
+                if grammar not in Parser.lark_parsers:
+                    Parser.lark_parsers[grammar] = self._build_parser(grammar)
+
+            self.parser = Parser.lark_parsers[grammar]
+
+    def _build_parser(self, grammar, transformer=None):
+        # the standalone parser has its tables as literal data, so Lark is not even imported
+        if standalone_parser and standalone_parser_digest(grammar) == standalone_parser.GRAMMAR_DIGEST:
+            return standalone_parser.Lark_StandAlone(transformer=transformer)
+
+        from lark import Lark
+
+        # the parse tables are also cached on disk, so even a new process does not need to build them again
+        return Lark(grammar, parser='lalr', lexer='basic', cache=get_lark_cache_path(grammar), tree_class=Tree, transformer=transformer)
+
+    def parse(self, tokens):
+        errors = []
+        syntax_errors = []
+
+        # the invalid tokens are collected while the parser consumes the tokens, so the tokens are passed only once
+        token_stream = self._collect_invalid_tokens(tokens, errors)
+
         result = None
         try:
-            result = self.parser.parse(token_list)
+            result = self._parse(token_stream, syntax_errors)
         except UnexpectedToken as e:
-            errors.append(UnexpectedTokenException(e.token, e.expected, e.line))
+            syntax_errors.append(UnexpectedTokenException(e.token, e.expected, e.line))
+
+        # consuming the rest of the tokens to report the invalid tokens after an unrecoverable syntax error as well
+        for _ in token_stream:
+            pass
+
+        return errors + syntax_errors, result
+
+    def _parse(self, token_stream, syntax_errors):
+        # the tokens are fed directly to the LALR parser, so its own lexer is never used
+        interactive_parser = self.parser.parse_interactive()
+        tokens = (Token(token.name, value=token.attributes, line=line_number) for token, line_number in token_stream)
+
+        last_token = None
+        resynchronizing_token = None
+        accepted_tokens = RECOVERY_ACCEPTED_TOKENS
+        token = next(tokens, None)
+
+        while token is not None:
+            last_token = token
+            try:
+                interactive_parser.feed_token(token)
+                accepted_tokens += 1
+                token = next(tokens, None)
+            except UnexpectedToken as e:
+                if token is resynchronizing_token:
+                    # the synchronizing token does not fit even after the recovery, so it is skipped
+                    token = next(tokens, None)
+                    continue
+
+                if accepted_tokens >= RECOVERY_ACCEPTED_TOKENS:
+                    syntax_errors.append(UnexpectedTokenException(e.token, e.expected, e.line))
+
+                accepted_tokens = 0
+
+                # panic mode - skipping to the end of the erroneous statement/declaration and resuming from there
+                token = self._skip_to_synchronizing_token(token, tokens)
+                if token is None or not self._recover(interactive_parser):
+                    return None
+
+                # the semicolon ends the erroneous statement, but the brackets may still start a block or end an enclosing one
+                if token.type == TOKEN_NAME_SEMICOLON:
+                    token = next(tokens, None)
+                else:
+                    resynchronizing_token = token
+
+        try:
+            result = interactive_parser.feed_eof(last_token)
+        except UnexpectedToken:
+            # an error right after a recovery is not reported, just like in the middle of the input
+            if accepted_tokens < RECOVERY_ACCEPTED_TOKENS:
+                return None
+
+            raise
+
+        # the result of a recovered parsing is incomplete
+        return None if syntax_errors else result
+
+    def _skip_to_synchronizing_token(self, token, tokens):
+        while token is not None and token.type not in SYNCHRONIZING_TOKENS:
+            token = next(tokens, None)
+
+        return token
+
+    def _recover(self, interactive_parser):
+        parser_state = interactive_parser.parser_state
+        states = parser_state.parse_conf.parse_table.states
+
+        # popping the states of the erroneous construct until a state which continues a list of statements or declarations,
+        #   the body of an if/while also expects a statement but resuming there would drop every following statement
+        while not self._is_recovery_state(states[parser_state.state_stack[-1]]):
+            if len(parser_state.state_stack) == 1:
+                return False
 
-        return errors, result
+            parser_state.state_stack.pop()
+            parser_state.value_stack.pop()
+
+        return True
+
+    def _is_recovery_state(self, state):
+        if "declaration" in state:
+            return True
+
+        return "stmt" in state and not STATEMENT_LIST_FOLLOWING_TOKENS.isdisjoint(state)
+
+    def _collect_invalid_tokens(self, tokens, errors):
+        for token, line_number in tokens:
+            if token.name == TOKEN_NAME_INVALID_TOKEN:
+                errors.append(InvalidTokenException(line_number, token))
+            else:
+                yield token, line_number
 
 class UnexpectedTokenException(CPLException):
     def __init__(self, found, expected, line_number):
-        super().__init__("Unexpected token {unexpected}, should be {expected}".format(unexpected=found, expected=expected), line_number)
\ No newline at end of file
+        # the expected tokens are a set, they are sorted so the message does not depend on the hash seed
+        expected = "{{{}}}".format(", ".join(repr(token) for token in sorted(expected)))
+        super().__init__("Unexpected token {unexpected}, should be {expected}".format(unexpected=found, expected=expected), line_number)
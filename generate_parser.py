@@ -0,0 +1,94 @@
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from lark import Lark
+from lark.tools.standalone import gen_standalone
+
+from consts import GRAMMAR_FILE_PATH, STANDALONE_PARSER_FILE_PATH, STANDALONE_PARSER_MODULE
+from custom_parser import get_lark_cache_path, standalone_parser_digest
+
+# every way of getting a parser, each one is timed from the start of a new process
+COLD_START_BENCHMARKS = {
+    "python startup": "pass",
+    "lark": "from lark import Lark; Lark(open({grammar!r}).read(), parser='lalr', lexer='basic')",
+    "lark with disk cache": "from lark import Lark; Lark(open({grammar!r}).read(), parser='lalr', lexer='basic', cache={cache!r})",
+    "standalone": "import {module}; {module}.Lark_StandAlone()",
+}
+
+BENCHMARK_SOURCE_PATH = "tests/basic.cpl"
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Generates the standalone parser module from the grammar")
+    argument_parser.add_argument("--benchmark", action="store_true",
+                                 help="compare the cold start time of the parser with and without the standalone module")
+    argument_parser.add_argument("--runs", type=int, default=21,
+                                 help="the number of processes to time for every benchmark (the median is reported)")
+
+    args = argument_parser.parse_args()
+
+    generate_parser()
+
+    if args.benchmark:
+        benchmark(args.runs)
+
+
+def generate_parser():
+    with open(GRAMMAR_FILE_PATH, "r") as grammar_file:
+        grammar = grammar_file.read()
+
+    # the tokens are fed by our own lexer, the basic lexer is required only to generate the module
+    parser = Lark(grammar, parser='lalr', lexer='basic')
+
+    standalone_parser = io.StringIO()
+    gen_standalone(parser, out=standalone_parser, compress=True)
+
+    with open(STANDALONE_PARSER_FILE_PATH, "w") as output_file:
+        # the generated module uses typing.cast (in Transformer_NonRecursive) without importing it
+        output_file.write("from typing import cast\n")
+        output_file.write(standalone_parser.getvalue())
+
+        # the digest lets the compiler detect a module which was generated from an older grammar or by an older generator
+        output_file.write("GRAMMAR_DIGEST = {!r}\n".format(standalone_parser_digest(grammar)))
+
+
+def benchmark(runs):
+    with open(GRAMMAR_FILE_PATH, "r") as grammar_file:
+        cache = get_lark_cache_path(grammar_file.read())
+
+    commands = {
+        name: [sys.executable, "-c", code.format(grammar=GRAMMAR_FILE_PATH, module=STANDALONE_PARSER_MODULE, cache=cache)]
+        for name, code in COLD_START_BENCHMARKS.items()
+    }
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        # the compiled source is copied, so its output file is not written into the repository
+        source_path = shutil.copy(BENCHMARK_SOURCE_PATH, temporary_directory)
+        commands["cpq {}".format(os.path.basename(source_path))] = [sys.executable, "cpq.py", source_path]
+
+        for name, command in commands.items():
+            print("{name}: {timing:.1f} ms".format(name=name, timing=time_command(command, runs) * 1000))
+
+
+def time_command(command, runs):
+    # the median time of running the command in a new process, the first run is not timed since it fills the caches
+    #   (the bytecode and the Lark disk cache)
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    main()
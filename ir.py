@@ -1,10 +1,19 @@
-import uuid
 from enum import Enum
-from lark import Transformer
+from custom_parser import Transformer_NonRecursive, Tree
 from consts import *
 from exceptions import CPLException
 
-from symbol_table import SymbolTable, SymbolUndefinedException
+from symbol_table import SymbolTable, SymbolTableVisitor, SymbolUndefinedException
+
+# the relations without an instruction, and the relations which are their negations
+INVERTED_RELATIONS = { ">=": "<", "<=": ">" }
+
+# a switch with up to this number of cases compares its value with every case, a larger switch uses a compare tree
+LINEAR_SWITCH_CASES = 4
+
+# the minimal ratio of the cases to the range of their numbers for a compare tree over every number in the range (a table),
+#   which needs no equality checks, instead of a binary search over the cases
+DENSE_SWITCH_DENSITY = 0.5
 
 class QuadInstruction:
     INSTRUCTION_TRANSLATION_TABLE = {
@@ -40,6 +49,8 @@ class QuadInstruction:
         ("label", SymbolTable.Types.INT): "label"
     }
 
+    __slots__ = ("operator", "type", "destination", "first_operand", "second_operarnd")
+
     def __init__(self, operator, type, dest, first_operand, second_operand):
         self.operator = operator
         self.type = type
@@ -55,80 +66,149 @@ class QuadInstruction:
     def code(self):
         return "{} {} {} {}".format(self.instruction, self.destination, self.first_operand, self.second_operarnd).strip()
     
-class TemporaryVariableFactory():
-    counter = 0
+class CodeBuffer:
+    # the code of a grammar variable - the code of its subtrees is linked instead of copied, so concatenation takes O(1)
+    #   and the instructions are copied only once, when iterating the code of the whole program in get_ir
+    def __init__(self, *chunks):
+        # each chunk is an instruction, a break statement placeholder, a list of them or another code buffer
+        self.chunks = list(chunks)
+
+    def append(self, instruction):
+        self.chunks.append(instruction)
+
+    def extend(self, code):
+        self.chunks.append(code)
+
+    def __iadd__(self, code):
+        self.extend(code)
+        return self
+
+    def __iter__(self):
+        # iterating without recursion, the buffers may be nested deeper than the recursion limit
+        chunks_stack = [iter(self.chunks)]
+
+        while chunks_stack:
+            for chunk in chunks_stack[-1]:
+                if isinstance(chunk, (CodeBuffer, list)):
+                    chunks_stack.append(iter(chunk.chunks if isinstance(chunk, CodeBuffer) else chunk))
+                    break
+
+                yield chunk
+            else:
+                chunks_stack.pop()
 
-    @staticmethod
-    def reset():
-        TemporaryVariableFactory.counter = 0
-    
-    @staticmethod
-    def get():
-        name = "t{}".format(TemporaryVariableFactory.counter)
-        TemporaryVariableFactory.counter += 1
+class CompilationContext():
+    # the state of a single compilation, which is passed to every grammar variable so compilations can run concurrently
+    def __init__(self, short_circuit=False):
+        self.temporary_variables_counter = 0
+        self.labels_counter = 0
+
+        # the semantic errors of every grammar variable, so they are reported even if the variable is not part of the code
+        self.errors = []
+        # whether the conditions are lowered to jumps which skip the rest of the condition once its result is known,
+        #   instead of computing the value of the condition
+        self.short_circuit = short_circuit
+
+    def get_temporary_variable(self):
+        name = "t{}".format(self.temporary_variables_counter)
+        self.temporary_variables_counter += 1
         return name
 
-class CPLAST2IR(Transformer):
-    def __init__(self, symbol_table):
+    def get_label(self):
+        # the labels are small integers, so the jumps are resolved by list indexing and the output is reproducible
+        label = self.labels_counter
+        self.labels_counter += 1
+        return label
+
+# the statements list is left recursive, so the parse tree is as deep as the program is long and it is transformed without recursion
+class CPLAST2IR(Transformer_NonRecursive):
+    def __init__(self, symbol_table, short_circuit=False):
         self.symbol_table = symbol_table
-        self.errors = []
+        self.context = CompilationContext(short_circuit)
+
+    @property
+    def errors(self):
+        return self.context.errors
     
     def start(self, tree):
-        return Program(tree)
+        return Program(self.context, tree)
     
     def stmt_block(self, tree):
-        return StatementBlock(tree)
+        return StatementBlock(self.context, tree)
 
     def stmtlist(self, tree):
-        return StatementList(tree)
+        return StatementList(self.context, tree)
 
     def stmt(self, tree):
-        return Statement(tree)
+        return Statement(self.context, tree)
     
     def assignment_stmt(self, tree):
-        return AssignmentStatement(tree, self.symbol_table)
+        return AssignmentStatement(self.context, tree, self.symbol_table)
     
     def expression(self, tree):
-        return Expression(tree)
+        return Expression(self.context, tree)
     
     def term(self, tree):
-        return Term(tree)
+        return Term(self.context, tree)
     
     def factor(self, tree):
-        return Factor(tree, self.symbol_table)
+        return Factor(self.context, tree, self.symbol_table)
     
     def boolexpr(self, tree):
-        return BoolExpression(tree)
+        return BoolExpression(self.context, tree)
     
     def boolterm(self, tree):
-        return BoolTerm(tree)
+        return BoolTerm(self.context, tree)
     
     def boolfactor(self, tree):
-        return BoolFactor(tree)
+        return BoolFactor(self.context, tree)
     
     def input_stmt(self, tree):
-        return InputStatement(tree, self.symbol_table)
+        return InputStatement(self.context, tree, self.symbol_table)
     
     def output_stmt(self, tree):
-        return OutputStatement(tree)
+        return OutputStatement(self.context, tree)
     
     def if_stmt(self, tree):
-        return IfStatement(tree)
+        return IfStatement(self.context, tree)
     
     def while_stmt(self, tree):
-        return WhileStatement(tree)
+        return WhileStatement(self.context, tree)
     
     def switch_stmt(self, tree):
-        return SwitchStatement(tree)
+        return SwitchStatement(self.context, tree)
     
-    def castlist(self, tree):
-        return Caselist(tree)
+    def caselist(self, tree):
+        return Caselist(self.context, tree, self.symbol_table)
     
     def break_stmt(self, tree):
-        return BreakStatement(tree)
+        return BreakStatement(self.context, tree)
     
     def epsilon(self, tree):
         pass
+
+class CPLSyntaxDirectedTranslator(CPLAST2IR):
+    # used as the parser transformer, so the IR and the symbol table are built on every reduction and no parse tree is kept
+    def __init__(self, symbol_table, short_circuit=False):
+        super().__init__(symbol_table, short_circuit)
+        self.symbol_table_visitor = SymbolTableVisitor(symbol_table)
+
+    @property
+    def symbol_table_errors(self):
+        return self.symbol_table_visitor.errors
+
+    # the declarations are reduced before the statements block, so every symbol is defined before it is used
+    def declarations(self, tree):
+        pass
+
+    def declaration(self, tree):
+        self.symbol_table_visitor.declaration(Tree("declaration", tree))
+
+    def idlist(self, tree):
+        self.symbol_table_visitor.idlist(Tree("idlist", tree))
+
+    def type(self, tree):
+        self.symbol_table_visitor.type(Tree("type", tree))
     
 
 class GrammarVariable:
@@ -143,7 +223,8 @@ class GrammarVariable:
         NODE_TYPE_STATEMENT_LIST = 7
         NODE_TYPE_CASE_LIST = 8
         
-    def __init__(self):
+    def __init__(self, context):
+        self.context = context
         self.errors = []
         self.breaks = set()
     
@@ -153,6 +234,31 @@ class GrammarVariable:
         except:
             return None
     
+    def add_error(self, error):
+        self.errors.append(error)
+        self.context.errors.append(error)
+
+    def backpatch(self, jumps, label):
+        for jump in jumps:
+            jump.destination = label
+
+    def place_label(self, jumps):
+        # returns the code of a new label which the jumps are patched to, or no code if there are no jumps
+        if not jumps:
+            return []
+
+        label = self.context.get_label()
+        self.backpatch(jumps, label)
+
+        return [QuadInstruction("label", SymbolTable.Types.INT, label, "", "")]
+
+    def inherit_condition_jumps(self, condition):
+        # a short-circuit condition continues to the code after it when its result is falls_through_true,
+        #   otherwise it jumps by one of its jumps (which are patched once their targets are known)
+        self.true_jumps = condition.true_jumps
+        self.false_jumps = condition.false_jumps
+        self.falls_through_true = condition.falls_through_true
+
     def handle_binary(self, tree):
         self.fix_binary_operands_types(tree)            
         self.code.append(QuadInstruction(tree[1].value, self.type, self.value, tree[0].value, tree[2].value))
@@ -162,15 +268,18 @@ class GrammarVariable:
 
         self.code = tree[0].code
         self.code.extend(tree[2].code)
-        self.value = TemporaryVariableFactory.get()
+        self.value = self.context.get_temporary_variable()
 
         left_operand = tree[0].value
         right_operand = tree[2].value
 
-        if tree[0].type != tree[2].type:
+        if tree[0].type is None or tree[2].type is None:
+            # an operand is an undefined symbol, which is already reported, so the type of the result is unknown as well
+            self.type = None
+        elif tree[0].type != tree[2].type:
             # if they are of different types, the result must be FLOAT and one of them must be INT
             self.type = SymbolTable.Types.FLOAT
-            temporary_variable = TemporaryVariableFactory.get()
+            temporary_variable = self.context.get_temporary_variable()
 
             # choosing the right operand to convert according to its type (INT should be converted to FLOAT)
             conversion_operand = left_operand if tree[0].type == SymbolTable.Types.INT else right_operand
@@ -183,19 +292,19 @@ class GrammarVariable:
             self.type = tree[0].type
 
 class Program(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         self.breaks = self.breaks.union(tree[1].breaks)
-        self.code = tree[1].code + [QuadInstruction("halt", SymbolTable.Types.INT, "", "", "")]
+        self.code = CodeBuffer(tree[1].code, QuadInstruction("halt", SymbolTable.Types.INT, "", "", ""))
 
         # we recorded every appearance of break statement out of while/switch statements and now we need to report their appearance
-        for _break in self.breaks:
-            self.errors.append(SemanticException("Unexpected 'break' statement (outside of 'while'/'switch' statement)", _break.line))
+        for _break in sorted(self.breaks, key=lambda _break: _break.line):
+            self.add_error(SemanticException("Unexpected 'break' statement (outside of 'while'/'switch' statement)", _break.line))
 
 class StatementBlock(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
         
         self.code = tree[1].code
         self.breaks = self.breaks.union(tree[1].breaks)
@@ -203,35 +312,38 @@ class StatementBlock(GrammarVariable):
 class StatementList(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_STATEMENT_LIST
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         try:
             _ = tree[0].get_node_type()
-            self.code = tree[0].code + tree[1].code
+
+            # the statement list is left recursive, so the statements are appended to the code of the previous statements
+            self.code = tree[0].code
+            self.code.extend(tree[1].code)
             self.breaks = self.breaks.union(tree[0].breaks)
             self.breaks = self.breaks.union(tree[1].breaks)
         except:
-            self.code = []
+            self.code = CodeBuffer()
 
 class Statement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         self.code = tree[0].code
         self.breaks = self.breaks.union(tree[0].breaks)
 
 class AssignmentStatement(GrammarVariable):
-    def __init__(self, tree, symbol_table):
-        super().__init__()
+    def __init__(self, context, tree, symbol_table):
+        super().__init__(context)
 
         # reusing the Factor code to resolve the variable from the symbol table
-        id = Factor(tree, symbol_table)
+        id = Factor(context, tree, symbol_table)
 
         # cannot assign float to integer variable
         if id.type == SymbolTable.Types.INT and tree[2].type == SymbolTable.Types.FLOAT:
-            self.errors = [SemanticException("Unable to assign floating point number to integer variable", tree[1].line)]
-            self.code = []
+            self.add_error(SemanticException("Unable to assign floating point number to integer variable", tree[1].line))
+            self.code = CodeBuffer()
         else:
             self.type = id.type
             self.value = id.value
@@ -241,18 +353,18 @@ class AssignmentStatement(GrammarVariable):
             
             # if they are of different type, we should convert the assigned expression to FLOAT
             if id.type == SymbolTable.Types.FLOAT and tree[2].type == SymbolTable.Types.INT:
-                temporary_variable = TemporaryVariableFactory.get()
+                temporary_variable = self.context.get_temporary_variable()
                 left_operand = temporary_variable
                 self.code.append(QuadInstruction("CAST", id.type, temporary_variable, tree[2].value, ""))
 
             self.code.append(QuadInstruction("=", self.type, self.value, left_operand, ""))
 
 class InputStatement(GrammarVariable):
-    def __init__(self, tree, symbol_table):
-        super().__init__()
+    def __init__(self, context, tree, symbol_table):
+        super().__init__(context)
 
         # reusing the Factor code to resolve the variable from the symbol table
-        tree[2] = Factor([tree[2]], symbol_table)
+        tree[2] = Factor(context, [tree[2]], symbol_table)
         self.type = tree[2].type
         self.code = tree[2].code
         self.value = tree[2].value
@@ -260,8 +372,8 @@ class InputStatement(GrammarVariable):
         self.code.append(QuadInstruction("INPUT", self.type, self.value, "", ""))
 
 class OutputStatement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         self.type = tree[2].type
         self.code = tree[2].code
@@ -270,136 +382,219 @@ class OutputStatement(GrammarVariable):
         self.code.append(QuadInstruction("OUTPUT", self.type, self.value, "", ""))
 
 class IfStatement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
-        false_stmt_label = uuid.uuid4().hex
-        end_stmt_label = uuid.uuid4().hex
+        false_stmt_label = self.context.get_label()
+        end_stmt_label = self.context.get_label()
 
         # adding every break statement which don't belong to while/swith statement
         self.breaks = self.breaks.union(tree[4].breaks)
         self.breaks = self.breaks.union(tree[6].breaks)
 
+        if self.context.short_circuit:
+            self._handle_short_circuit(tree, end_stmt_label)
+            return
+
         # Appearance list: Condition code, jump to the "Else statement" if the condition does not met, true statement, jump to the end of the if after the true statement
         #   placeholder for the calculation of the "Else statement" conditional jump, "else statement" code and a placeholder for the calculation of the end of the if
-        self.code = (
-            tree[2].code +
-            [QuadInstruction("jump_zero", SymbolTable.Types.INT, false_stmt_label, tree[2].value, "")] +
-            tree[4].code +
-            [QuadInstruction("jump", SymbolTable.Types.INT, end_stmt_label, "", ""), QuadInstruction("label", SymbolTable.Types.INT, false_stmt_label, "", "")] +
-            tree[6].code +
-            [QuadInstruction("label", SymbolTable.Types.INT, end_stmt_label, "", "")]
+        self.code = CodeBuffer(
+            tree[2].code,
+            QuadInstruction("jump_zero", SymbolTable.Types.INT, false_stmt_label, tree[2].value, ""),
+            tree[4].code,
+            QuadInstruction("jump", SymbolTable.Types.INT, end_stmt_label, "", ""), QuadInstruction("label", SymbolTable.Types.INT, false_stmt_label, "", ""),
+            tree[6].code,
+            QuadInstruction("label", SymbolTable.Types.INT, end_stmt_label, "", "")
         )
 
+    def _handle_short_circuit(self, tree, end_stmt_label):
+        condition = tree[2]
+        end_stmt = QuadInstruction("label", SymbolTable.Types.INT, end_stmt_label, "", "")
+
+        # the statement which the condition falls through to is placed right after it, so no jump is needed to reach it
+        if condition.falls_through_true:
+            self.code = CodeBuffer(
+                condition.code, self.place_label(condition.true_jumps), tree[4].code,
+                QuadInstruction("jump", SymbolTable.Types.INT, end_stmt_label, "", ""),
+                self.place_label(condition.false_jumps), tree[6].code, end_stmt
+            )
+        else:
+            self.code = CodeBuffer(
+                condition.code, self.place_label(condition.false_jumps), tree[6].code,
+                QuadInstruction("jump", SymbolTable.Types.INT, end_stmt_label, "", ""),
+                self.place_label(condition.true_jumps), tree[4].code, end_stmt
+            )
+
 class WhileStatement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
-        condition_label = uuid.uuid4().hex
-        end_while_label = uuid.uuid4().hex
+        condition_label = self.context.get_label()
+        end_while_label = self.context.get_label()
 
         # adding for every appearace of break statement the end of the while placeholding label to be calculated later as the jump offset
         for _break in tree[4].breaks:
             _break.label = end_while_label
 
+        if self.context.short_circuit:
+            self._handle_short_circuit(tree, condition_label, end_while_label)
+            return
+
         # Appearance list: start of the while placeholder for the calculation of the repeating condition, condition code, conditional jump to the end of the while-loop,
         #   true statement code, jump to the start of the condition code, placeholder for the end of the while-loop
-        self.code = (
-            [QuadInstruction("label", SymbolTable.Types.INT, condition_label, "", "")] +
-            tree[2].code +
-            [QuadInstruction("jump_zero", SymbolTable.Types.INT, end_while_label, tree[2].value, "")] +
-            tree[4].code +
-            [QuadInstruction("jump", SymbolTable.Types.INT, condition_label, "", ""), QuadInstruction("label", SymbolTable.Types.INT, end_while_label, "", "")]
+        self.code = CodeBuffer(
+            QuadInstruction("label", SymbolTable.Types.INT, condition_label, "", ""),
+            tree[2].code,
+            QuadInstruction("jump_zero", SymbolTable.Types.INT, end_while_label, tree[2].value, ""),
+            tree[4].code,
+            QuadInstruction("jump", SymbolTable.Types.INT, condition_label, "", ""), QuadInstruction("label", SymbolTable.Types.INT, end_while_label, "", "")
+        )
+
+    def _handle_short_circuit(self, tree, condition_label, end_while_label):
+        condition = tree[2]
+
+        # the loop body must follow the condition, so a condition which falls through when it is false jumps to the end of the loop
+        if not condition.falls_through_true:
+            jump = QuadInstruction("jump", SymbolTable.Types.INT, None, "", "")
+            condition.code.append(jump)
+            condition.false_jumps.append(jump)
+
+        self.backpatch(condition.false_jumps, end_while_label)
+
+        self.code = CodeBuffer(
+            QuadInstruction("label", SymbolTable.Types.INT, condition_label, "", ""),
+            condition.code, self.place_label(condition.true_jumps), tree[4].code,
+            QuadInstruction("jump", SymbolTable.Types.INT, condition_label, "", ""), QuadInstruction("label", SymbolTable.Types.INT, end_while_label, "", "")
         )
 
 class SwitchStatement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
-        self.code = []
+    def __init__(self, context, tree):
+        super().__init__(context)
+        self.code = CodeBuffer()
 
         if tree[2].type != SymbolTable.Types.INT:
-            self.errors = [SemanticException("Invalid switch condition - must be of an integer value", tree[0].line)] 
+            # a condition of an unknown type has an undefined symbol, which is already reported
+            if tree[2].type is not None:
+                self.add_error(SemanticException("Invalid switch condition - must be of an integer value", tree[0].line))
         else:
-            # creating placeholders for each condition, the default and the end of the switch
-            end_stmt_label = uuid.uuid4().hex
-            default_stmt_label = uuid.uuid4().hex
-            conditions_labels = { case_number: uuid.uuid4().hex for case_number in tree[5].cases }
-
-            listed_cases = list(tree[5].cases)
+            # creating placeholders for each case, the default and the end of the switch
+            end_stmt_label = self.context.get_label()
+            default_stmt_label = self.context.get_label()
+            cases_labels = { case_number: self.context.get_label() for case_number in tree[5].cases }
 
-            # the condition code
+            # the condition code, followed by the jumps to the matching case
             self.code = tree[2].code
+            self.code.extend(self._get_dispatch_code(tree[2].value, cases_labels, default_stmt_label))
 
-            # temporary variable to check the whether the condition is met
-            temporary_variable = TemporaryVariableFactory.get()
-
-            for index, (key, value) in enumerate(tree[5].cases):
-                # placeholder of the current condition and a checking if the condition is met
-                self.code.extend([QuadInstruction("label", SymbolTable.Types.INT, conditions_labels[key], "", ""), 
-                                  QuadInstruction("==", SymbolTable.Types.INT, temporary_variable, tree[2].value, key)])
-                
-                # if there are more conditions to check, create a conditional jump to the next condition, otherwise to the default condition
-                if index + 1 == len(tree[5].cases):
-                    self.code.append(QuadInstruction("jump_zero", SymbolTable.Types.INT, default_stmt_label, temporary_variable, ""))
-                else:
-                    next_key, _ = listed_cases[index + 1]
-                    self.code.append(QuadInstruction("jump_zero", SymbolTable.Types.INT, conditions_labels[next_key], "", ""))
-                
-                # add the case code so if the condition is met, the case code will be executed
-                self.code += value.code
+            # the cases code in their order, so a case without a break statement continues to the next case
+            for case_number, case_stmtlist in tree[5].cases.items():
+                self.code.append(QuadInstruction("label", SymbolTable.Types.INT, cases_labels[case_number], "", ""))
+                self.code.extend(case_stmtlist.code)
             
             # add a placeholder for the default case, the default case code and the end of the switch statement to be jumped by break statements
-            self.code += (
-                [QuadInstruction("label", SymbolTable.Types.INT, default_stmt_label, "", "")] +
-                tree[8].code +
-                [QuadInstruction("label", SymbolTable.Types.INT, end_stmt_label, "", "")]
-            )
+            self.code.append(QuadInstruction("label", SymbolTable.Types.INT, default_stmt_label, "", ""))
+            self.code.extend(tree[8].code)
+            self.code.append(QuadInstruction("label", SymbolTable.Types.INT, end_stmt_label, "", ""))
 
             # update all the break appearances with the placeholder of the end of the switch to be jumped
             for _break in tree[5].breaks.union(tree[8].breaks):
                 _break.label = end_stmt_label
 
+    def _get_dispatch_code(self, value, cases_labels, default_label):
+        temporary_variable = self.context.get_temporary_variable()
+        case_numbers = sorted(cases_labels)
+
+        if len(case_numbers) <= LINEAR_SWITCH_CASES:
+            targets = [(case_number, cases_labels[case_number]) for case_number in case_numbers]
+            return self._get_compare_tree_code(value, temporary_variable, targets, default_label, None, None, LINEAR_SWITCH_CASES)
+
+        if len(case_numbers) >= DENSE_SWITCH_DENSITY * (case_numbers[-1] - case_numbers[0] + 1):
+            # there is no indirect jump, so the table is a compare tree over every number in the range,
+            #   its leaves are single numbers, and only the numbers at the edges of the range are checked for equality (the bounds check)
+            targets = [(number, cases_labels.get(number, default_label)) for number in range(case_numbers[0], case_numbers[-1] + 1)]
+            return self._get_compare_tree_code(value, temporary_variable, targets, default_label, None, None, 1)
+
+        # a binary search over the cases, with a linear search in its leaves
+        targets = [(case_number, cases_labels[case_number]) for case_number in case_numbers]
+        return self._get_compare_tree_code(value, temporary_variable, targets, default_label, None, None, LINEAR_SWITCH_CASES)
+
+    def _get_compare_tree_code(self, value, temporary_variable, targets, default_label, low, high, leaf_size):
+        # targets are the sorted case numbers and their labels, low and high are the bounds of the value which are known
+        #   from the previous comparisons (None if there is no such bound)
+        if len(targets) <= leaf_size:
+            code = []
+
+            for case_number, label in targets:
+                # the previous comparisons leave a single possible value
+                if low == high == case_number:
+                    return code + [QuadInstruction("jump", SymbolTable.Types.INT, label, "", "")]
+
+                code.extend([QuadInstruction("!=", SymbolTable.Types.INT, temporary_variable, value, case_number),
+                             QuadInstruction("jump_zero", SymbolTable.Types.INT, label, temporary_variable, "")])
+
+            return code + [QuadInstruction("jump", SymbolTable.Types.INT, default_label, "", "")]
+
+        middle = len(targets) // 2
+        middle_number = targets[middle][0]
+
+        lower_half_code = self._get_compare_tree_code(value, temporary_variable, targets[:middle], default_label, low, middle_number - 1, leaf_size)
+        upper_half_code = self._get_compare_tree_code(value, temporary_variable, targets[middle:], default_label, middle_number, high, leaf_size)
+
+        # an upper half which needs no comparisons is jumped to directly
+        if len(upper_half_code) == 1 and upper_half_code[0].operator == "jump":
+            upper_half_label = upper_half_code[0].destination
+            upper_half_code = []
+        else:
+            upper_half_label = self.context.get_label()
+            upper_half_code.insert(0, QuadInstruction("label", SymbolTable.Types.INT, upper_half_label, "", ""))
+
+        # jumping to the upper half if the value is not smaller than the middle case number
+        return ([QuadInstruction("<", SymbolTable.Types.INT, temporary_variable, value, middle_number),
+                 QuadInstruction("jump_zero", SymbolTable.Types.INT, upper_half_label, temporary_variable, "")]
+                + lower_half_code + upper_half_code)
+
 
 class Caselist(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_CASE_LIST
 
-    def __init__(self, tree, symbol_table):
-        super().__init__()
-        self.code = []
+    def __init__(self, context, tree, symbol_table):
+        super().__init__(context)
+        self.code = CodeBuffer()
+        self.cases = {}
         
         try:
             # if the leftmost subtree is caselist, that means that we are not in the caselist->epsilon rule
             _ = tree[0].get_node_type()
-            self.cases = {}
             self.breaks = self.breaks.union(tree[0].breaks)
             self.breaks = self.breaks.union(tree[4].breaks)
 
             # reusing the Factor code to resolve the case number
-            case_number = Factor([tree[2]], symbol_table)
+            case_number = Factor(context, [tree[2]], symbol_table)
 
             if case_number.type != SymbolTable.Types.INT:
-                self.errors = [ SemanticException("Invalid switch case number - must be of an integer value", tree[1].line)]
+                self.add_error(SemanticException("Invalid switch case number - must be of an integer value", tree[1].line))
             else:
                 self.cases.update(tree[0].cases)
 
                 if case_number.value in self.cases:
-                    self.errors = [SemanticException("Invalid switch case number - case already exist", tree[1].line)]
+                    self.add_error(SemanticException("Invalid switch case number - case already exist", tree[1].line))
                 else:
                     self.cases[case_number.value] = tree[4]
-                    self.code = tree[0].code + tree[4].code
+                    self.code = tree[0].code
+                    self.code.extend(tree[4].code)
         except:
             pass
 
 class BreakStatement(GrammarVariable):
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
         self.label = None
         self.line = tree[0].line
         self.breaks.add(self)
     
     @property
     def code(self):
-        if self.label:
+        if self.label is not None:
             return [QuadInstruction("jump", SymbolTable.Types.INT, self.label, "", "")]
         else:
             return [self]
@@ -407,8 +602,8 @@ class BreakStatement(GrammarVariable):
 class Expression(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_EXPRESSION
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         if tree[0].get_node_type() == GrammarVariable.NODE_TYPES.NODE_TYPE_EXPRESSION:
             self.handle_binary(tree)
@@ -420,8 +615,8 @@ class Expression(GrammarVariable):
 class Term(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_TERM
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         if tree[0].get_node_type() == GrammarVariable.NODE_TYPES.NODE_TYPE_TERM:
             self.handle_binary(tree)
@@ -433,8 +628,8 @@ class Term(GrammarVariable):
 class Factor(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_FACTOR
 
-    def __init__(self, tree, symbol_table):
-        super().__init__()
+    def __init__(self, context, tree, symbol_table):
+        super().__init__(context)
 
         if tree[0].type == TOKEN_NAME_ID:
             self._handle_id(tree, symbol_table)
@@ -448,25 +643,25 @@ class Factor(GrammarVariable):
             self.value = tree[1].value
 
     def _handle_id(self, tree, symbol_table: SymbolTable):
-        self.code = []
+        self.code = CodeBuffer()
         try:
             symbol = symbol_table.try_get_symbol(tree[0].value, tree[0].line)
             self.type = symbol.type
             self.value = symbol.name
         except SymbolUndefinedException as e:
-            self.errors = [e]
+            self.add_error(e)
             self.type = None
             self.value = tree[0].value
 
     def _handle_num(self, tree):
-        self.code = []
+        self.code = CodeBuffer()
         self.type = SymbolTable.Types.FLOAT if type(tree[0].value) == float else SymbolTable.Types.INT
         self.value = float(tree[0].value) if self.type == SymbolTable.Types.FLOAT else int(tree[0].value)
     
     def _handle_cast(self, tree):
         self.type = tree[0].value
         self.code = tree[2].code
-        self.value = TemporaryVariableFactory.get()
+        self.value = self.context.get_temporary_variable()
 
         if self.type != tree[2].type:
             self.code.append(QuadInstruction(tree[0].type, self.type, self.value, tree[2].value, ""))
@@ -478,15 +673,21 @@ class Factor(GrammarVariable):
 class BoolExpression(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_BOOL_EXPRESSION
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         if tree[0].get_node_type() == GrammarVariable.NODE_TYPES.NODE_TYPE_BOOL_EXPRESSION:
-            self._handle_or(tree)
+            if self.context.short_circuit:
+                self._handle_or_short_circuit(tree)
+            else:
+                self._handle_or(tree)
         else:
             self.type = tree[0].type
             self.code = tree[0].code
             self.value = tree[0].value
+
+            if self.context.short_circuit:
+                self.inherit_condition_jumps(tree[0])
         
         self.type = SymbolTable.Types.INT
 
@@ -497,43 +698,85 @@ class BoolExpression(GrammarVariable):
         self.code.extend([QuadInstruction("+", self.type, self.value, tree[0].value, tree[2].value), 
                           QuadInstruction(">", SymbolTable.Types.INT, self.value, self.value, 0)])
 
+    def _handle_or_short_circuit(self, tree):
+        left, right = tree[0], tree[2]
+        self.code = left.code
+        self.value = None
+
+        # the right operand is evaluated only if the left operand is false
+        if left.falls_through_true:
+            jump = QuadInstruction("jump", SymbolTable.Types.INT, None, "", "")
+            self.code.append(jump)
+            left.true_jumps.append(jump)
+
+        self.code.extend(self.place_label(left.false_jumps))
+        self.code.extend(right.code)
+
+        self.true_jumps = left.true_jumps + right.true_jumps
+        self.false_jumps = right.false_jumps
+        self.falls_through_true = right.falls_through_true
+
 class BoolTerm(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_BOOL_TERM
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         if tree[0].get_node_type() == GrammarVariable.NODE_TYPES.NODE_TYPE_BOOL_TERM:
-            self._handle_and(tree)
+            if self.context.short_circuit:
+                self._handle_and_short_circuit(tree)
+            else:
+                self._handle_and(tree)
         else:
             self.type = tree[0].type
             self.code = tree[0].code
             self.value = tree[0].value
+
+            if self.context.short_circuit:
+                self.inherit_condition_jumps(tree[0])
         
         self.type = SymbolTable.Types.INT
     
     def _handle_and(self, tree):
         self.fix_binary_operands_types(tree)
-        temporary_variable = TemporaryVariableFactory.get()
 
-        # to check if both aren't zero, we can check if both equal 1
-        self.code.extend([QuadInstruction("==", self.type, temporary_variable, tree[0].value, 1), 
-                          QuadInstruction("==", self.type, self.value, tree[2].value, temporary_variable)])
+        # both are 0 or 1, so their product is 1 only if both are 1
+        self.code.append(QuadInstruction("*", self.type, self.value, tree[0].value, tree[2].value))
+
+    def _handle_and_short_circuit(self, tree):
+        left, right = tree[0], tree[2]
+        self.code = left.code
+        self.value = None
+
+        # the right operand is evaluated only if the left operand is true
+        if not left.falls_through_true:
+            jump = QuadInstruction("jump", SymbolTable.Types.INT, None, "", "")
+            self.code.append(jump)
+            left.false_jumps.append(jump)
+
+        self.code.extend(self.place_label(left.true_jumps))
+        self.code.extend(right.code)
+
+        self.true_jumps = right.true_jumps
+        self.false_jumps = left.false_jumps + right.false_jumps
+        self.falls_through_true = right.falls_through_true
 
 class BoolFactor(GrammarVariable):
     NODE_TYPE = GrammarVariable.NODE_TYPES.NODE_TYPE_BOOL_FACTOR
 
-    def __init__(self, tree):
-        super().__init__()
+    def __init__(self, context, tree):
+        super().__init__(context)
 
         try:
             # if we can get the node type, that means it is an expression, otherwise it is the NOT terminal
             _ = tree[0].get_node_type()
 
-            if tree[1].value == ">=":
+            if self.context.short_circuit:
+                self._handle_relation_short_circuit(tree)
+            elif tree[1].value == ">=":
                 self.fix_binary_operands_types(tree)
-                self.value = TemporaryVariableFactory.get()
-                temporary_variable = TemporaryVariableFactory.get()
+                self.value = self.context.get_temporary_variable()
+                temporary_variable = self.context.get_temporary_variable()
                 
                 # we check whether they are equal OR (with the same logic of _handle_or) one is bigger than the other
                 self.code.extend([
@@ -544,8 +787,8 @@ class BoolFactor(GrammarVariable):
                 ])
             elif tree[1].value == "<=":
                 self.fix_binary_operands_types(tree)
-                self.value = TemporaryVariableFactory.get()
-                temporary_variable = TemporaryVariableFactory.get()
+                self.value = self.context.get_temporary_variable()
+                temporary_variable = self.context.get_temporary_variable()
 
                 # we check whether they are equal OR (with the same logic of _handle_or) one is smaller than the other
                 self.code.extend([
@@ -561,19 +804,38 @@ class BoolFactor(GrammarVariable):
             self.code = tree[2].code
             self.value = tree[2].value
 
-            self.code.append(QuadInstruction("!=", self.type, self.value, self.value, "1"))
+            if self.context.short_circuit:
+                # the negation just swaps the jumps of the condition, so it has no code
+                self.true_jumps, self.false_jumps = tree[2].false_jumps, tree[2].true_jumps
+                self.falls_through_true = not tree[2].falls_through_true
+            else:
+                self.code.append(QuadInstruction("!=", self.type, self.value, self.value, "1"))
         
         self.type = SymbolTable.Types.INT
-        
 
-def get_ir(ast, symbol_table):
-    TemporaryVariableFactory.reset()
+    def _handle_relation_short_circuit(self, tree):
+        self.fix_binary_operands_types(tree)
+        jump = QuadInstruction("jump_zero", SymbolTable.Types.INT, None, self.value, "")
 
-    ast_transformer = CPLAST2IR(symbol_table)
+        if tree[1].value in INVERTED_RELATIONS:
+            # there is no ">=" or "<=" instruction, so the inverted relation is computed and the jump is taken when it is zero
+            self.code.extend([QuadInstruction(INVERTED_RELATIONS[tree[1].value], self.type, self.value, tree[0].value, tree[2].value), jump])
+            self.true_jumps, self.false_jumps, self.falls_through_true = [jump], [], False
+        else:
+            self.code.extend([QuadInstruction(tree[1].value, self.type, self.value, tree[0].value, tree[2].value), jump])
+            self.true_jumps, self.false_jumps, self.falls_through_true = [], [jump], True
+        
+
+def get_ir(ast, symbol_table, short_circuit=False):
+    ast_transformer = CPLAST2IR(symbol_table, short_circuit)
     ir_tree = ast_transformer.transform(ast)
 
-    if ast_transformer.errors:
-        return ast_transformer.errors, []
+    return get_program_ir(ast_transformer, ir_tree)
+
+def get_program_ir(translator, ir_tree):
+    if translator.errors:
+        # the grammar variables are built from the innermost one, so their errors are sorted back into the source order
+        return sorted(translator.errors, key=lambda error: error.line_number), []
 
     ir = []
     for instruction in ir_tree.code:
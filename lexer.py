@@ -1,6 +1,6 @@
 from collections import namedtuple
 import re
-from consts import TOKEN_NAME_IGNORE_TOKEN, TOKEN_NAME_INVALID_TOKEN
+from consts import SOURCE_ENCODING, TOKEN_NAME_IGNORE_TOKEN, TOKEN_NAME_INVALID_TOKEN
 
 from exceptions import CPLException
 
@@ -8,6 +8,7 @@ MatchedToken = namedtuple("Token", ["name", "lexeme", "attributes"])
 
 class PatternToken:
     def __init__(self, pattern, handler):
+        self.raw_pattern = pattern
         self.pattern = re.compile(r"^({pattern}).*".format(pattern=pattern), re.MULTILINE)
         self.handler = handler
     
@@ -19,6 +20,20 @@ class PatternToken:
         match = self._match(string)
         return self.handler(match) if match is not None else None
 
+class IdentifierPatternToken(PatternToken):
+    def __init__(self, pattern, handler):
+        super().__init__(pattern, self._classify)
+        self.identifier_handler = handler
+        self.reserved_words = {}
+
+    def add_reserved_word(self, word, handler):
+        # the reserved word must be matched by the identifier pattern, it is recognized by a lookup after the match
+        self.reserved_words[word] = handler
+
+    def _classify(self, matching_string):
+        handler = self.reserved_words.get(matching_string, self.identifier_handler)
+        return handler(matching_string)
+
 class TokenList:
     def __init__(self, token_list):
         self.token_list = token_list
@@ -37,18 +52,56 @@ class TokenList:
         return token
 
 class Tokenizer:
-    def __init__(self):
+    def __init__(self, single_pass=True):
         self.pattern_tokens = []
+        self.single_pass = single_pass
+        self.master_patterns = {}
 
     def add_token(self, token: PatternToken):
         self.pattern_tokens.append(token)
+
+        # the combined patterns have to be rebuilt to include the new token
+        self.master_patterns = {}
     
     def tokenize(self, string):
+        return TokenList(list(self.tokenize_stream(string)))
+
+    def tokenize_stream(self, string):
+        # lazily yields the (token, line number) pairs, so the tokens are produced only while being consumed
+        #   the single pass scanner also accepts a bytes-like input (e.g. mmap) which is scanned without being copied
         self.input = string
         self.cursor = 0
         self.line_number = 1
 
-        return TokenList(self._tokenize())
+        if self.single_pass:
+            return self._tokenize_single_pass()
+
+        return self._tokenize()
+
+    def _get_master_pattern(self, binary):
+        if binary not in self.master_patterns:
+            self.master_patterns[binary] = self._build_master_pattern(binary)
+
+        return self.master_patterns[binary]
+
+    def _build_master_pattern(self, binary):
+        # every pattern is wrapped by an optional lookahead, so a single match at the cursor captures the lexeme
+        #   of each pattern that matches there without consuming any input
+        master_pattern = "".join(
+            r"(?:(?=(?P<_pattern_token_{index}>{pattern}))|)".format(index=index, pattern=pattern_token.raw_pattern)
+            for index, pattern_token in enumerate(self.pattern_tokens)
+        )
+
+        # bytes-like inputs can only be matched by a bytes pattern
+        if binary:
+            master_pattern = master_pattern.encode(SOURCE_ENCODING)
+
+        master_pattern = re.compile(master_pattern, re.MULTILINE)
+        groups = [
+            master_pattern.groupindex["_pattern_token_{index}".format(index=index)] for index in range(len(self.pattern_tokens))
+        ]
+
+        return master_pattern, groups
 
     def _handle_new_line(self, matching_string):
         self.line_number += matching_string.count("\n")
@@ -61,8 +114,6 @@ class Tokenizer:
         return MatchedToken(TOKEN_NAME_INVALID_TOKEN, matching_string, "")
 
     def _tokenize(self):
-        match_tokens = []
-
         while self.cursor < len(self.input):
             current_token_match_list = []
             for pattern_token in self.pattern_tokens:
@@ -75,9 +126,37 @@ class Tokenizer:
             self.cursor += len(final_token.lexeme)
 
             if final_token.name != TOKEN_NAME_IGNORE_TOKEN:
-                match_tokens.append((final_token, self.line_number))
-        
-        return match_tokens
+                yield final_token, self.line_number
+
+    def _tokenize_single_pass(self):
+        binary = not isinstance(self.input, str)
+        master_pattern, groups = self._get_master_pattern(binary)
+
+        if len(groups) == 1:
+            # match.group returns a plain string instead of a tuple when given a single group
+            groups = groups * 2
+
+        input_length = len(self.input)
+
+        while self.cursor < input_length:
+            lexemes = master_pattern.match(self.input, self.cursor).group(*groups)
+
+            # search for the longest matched string, the first registered token wins a tie just like in _tokenize
+            final_index, final_lexeme = None, ""
+            for index, lexeme in enumerate(lexemes):
+                if lexeme is not None and (final_index is None or len(lexeme) > len(final_lexeme)):
+                    final_index, final_lexeme = index, lexeme
+
+            # the cursor is advanced by the length of the raw match, which is counted in bytes for a bytes-like input
+            self.cursor += len(final_lexeme)
+
+            if binary:
+                final_lexeme = final_lexeme.decode(SOURCE_ENCODING, errors="replace")
+
+            final_token = self.pattern_tokens[final_index].handler(final_lexeme)
+
+            if final_token.name != TOKEN_NAME_IGNORE_TOKEN:
+                yield final_token, self.line_number
 
 class InvalidTokenException(CPLException):
     def __init__(self, line_number, token):
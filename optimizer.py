@@ -0,0 +1,572 @@
+import re
+from cfg import JUMP_OPERATORS, ControlFlowGraph, DominatorTree, get_defined_type, get_defined_variable, get_used_variables, is_variable
+from ir import QuadInstruction
+from symbol_table import SymbolTable
+
+# the instructions which only compute a value, so computing it once before a loop is the same as computing it on every iteration
+HOISTABLE_OPERATORS = ("=", "CAST", "+", "-", "*", "/", "==", "!=", "<", ">")
+
+# the operators whose operands can be swapped, so both orders are numbered as the same expression
+COMMUTATIVE_OPERATORS = ("+", "*", "==", "!=")
+
+
+def coalesce_temporaries(ir, symbol_table):
+    # renames the temporary variables so temporaries which are never live at the same time share a name,
+    #   returns the renamed IR and the number of temporary variables names which were saved
+    control_flow_graph = ControlFlowGraph(ir)
+    live_out = control_flow_graph.compute_liveness()
+
+    # every variable which is not declared by the program is a temporary variable
+    def is_temporary(variable):
+        return variable not in symbol_table.symbols
+
+    temporaries = []
+    temporaries_types = {}
+    interferences = {}
+
+    for instruction in ir:
+        defined_variable = get_defined_variable(instruction)
+        if defined_variable and is_temporary(defined_variable) and defined_variable not in interferences:
+            temporaries.append(defined_variable)
+            temporaries_types[defined_variable] = get_defined_type(instruction)
+            interferences[defined_variable] = set()
+
+    # a temporary interferes with every temporary which is live where it is defined
+    for block in control_flow_graph.blocks:
+        live = {variable for variable in live_out[block.index] if is_temporary(variable)}
+
+        for instruction in reversed(block.instructions):
+            defined_variable = get_defined_variable(instruction)
+
+            if defined_variable in interferences:
+                for variable in live:
+                    if variable != defined_variable:
+                        interferences[defined_variable].add(variable)
+                        interferences[variable].add(defined_variable)
+
+                live.discard(defined_variable)
+
+            live.update(variable for variable in get_used_variables(instruction) if is_temporary(variable))
+
+    # greedy coloring by the order of the first definition, every color is a temporary variable name
+    #   a variable has a single type in the quad code, so only temporaries of the same type can share a color
+    colors = {}
+    for temporary in temporaries:
+        temporary_type = temporaries_types[temporary]
+        used_colors = {colors[variable] for variable in interferences[temporary] if variable in colors}
+
+        color = 0
+        while (temporary_type, color) in used_colors:
+            color += 1
+
+        colors[temporary] = (temporary_type, color)
+
+    colors_names = {}
+    for color in colors.values():
+        if color not in colors_names:
+            colors_names[color] = "t{}".format(len(colors_names))
+
+    names = { temporary: colors_names[color] for temporary, color in colors.items() }
+
+    for instruction in ir:
+        instruction.destination = names.get(instruction.destination, instruction.destination)
+        instruction.first_operand = names.get(instruction.first_operand, instruction.first_operand)
+        instruction.second_operarnd = names.get(instruction.second_operarnd, instruction.second_operarnd)
+
+    return ir, len(temporaries) - len(colors_names)
+
+
+def remove_unreachable_blocks(ir):
+    # removes the blocks which no path from the start of the program reaches,
+    #   returns the optimized IR and the number of removed instructions
+    reachable_ir = [instruction for block in ControlFlowGraph(ir).get_reachable_blocks() for instruction in block.instructions]
+
+    return reachable_ir, len(ir) - len(reachable_ir)
+
+def number_values(ir):
+    # local value numbering - inside every basic block, a computation of a value which a variable already holds is replaced by a copy,
+    #   and the reads of a copied variable are replaced by reads of the variable it was copied from,
+    #   returns the optimized IR and the number of changed instructions
+    ir, coalesced_copies = _coalesce_copies(ir)
+    control_flow_graph = ControlFlowGraph(ir)
+    changed_instructions = coalesced_copies
+
+    for block in control_flow_graph.blocks:
+        value_numbering = ValueNumbering()
+        instructions = []
+
+        for instruction in block.instructions:
+            numbered_instruction = value_numbering.number(instruction)
+
+            if numbered_instruction is not instruction:
+                changed_instructions += 1
+
+            if numbered_instruction is not None:
+                instructions.append(numbered_instruction)
+
+        block.instructions = instructions
+
+    return control_flow_graph.get_ir(), changed_instructions
+
+class ValueNumbering:
+    def __init__(self):
+        self.values_count = 0
+
+        # the value number of every variable and constant, the value number of every computed expression,
+        #   and the variables which hold every value number (in the order they were assigned)
+        self.values = {}
+        self.constants = {}
+        self.expressions = {}
+        self.holders = {}
+
+    def number(self, instruction):
+        operator = instruction.operator
+
+        if operator == "OUTPUT":
+            operand = self._get_operand(instruction.destination, allow_immediate=True)
+            return instruction if operand == instruction.destination else QuadInstruction(operator, instruction.type, operand, "", "")
+
+        if operator == "jump_zero":
+            operand = self._get_operand(instruction.first_operand, allow_immediate=False)
+            return instruction if operand == instruction.first_operand else QuadInstruction(operator, instruction.type, instruction.destination, operand, "")
+
+        defined_variable = get_defined_variable(instruction)
+        if defined_variable is None:
+            return instruction
+
+        if operator not in HOISTABLE_OPERATORS:
+            # the input has a new value every time
+            self._assign(defined_variable, self._new_value())
+            return instruction
+
+        first_operand = self._get_operand(instruction.first_operand, allow_immediate=True)
+        second_operand = self._get_operand(instruction.second_operarnd, allow_immediate=True)
+        numbered_instruction = instruction
+
+        if operator == "=":
+            value = self._get_value(first_operand)
+
+            # the variable already holds the value
+            if self.values.get(defined_variable) == value:
+                return None
+        else:
+            operands_values = (self._get_value(first_operand), self._get_value(second_operand) if second_operand != "" else None)
+            if operator in COMMUTATIVE_OPERATORS:
+                operands_values = tuple(sorted(operands_values))
+
+            expression = (operator, instruction.type) + operands_values
+            value = self.expressions.get(expression)
+            holder = self._get_holder(value) if value is not None else None
+
+            if holder is not None:
+                # the value was already computed, so it is copied instead
+                numbered_instruction = QuadInstruction("=", get_defined_type(instruction), defined_variable, holder, "")
+            else:
+                value = self._new_value()
+                self.expressions[expression] = value
+
+        if numbered_instruction is instruction and (first_operand != instruction.first_operand or second_operand != instruction.second_operarnd):
+            numbered_instruction = QuadInstruction(operator, instruction.type, defined_variable, first_operand, second_operand)
+
+        self._assign(defined_variable, value)
+
+        return numbered_instruction
+
+    def _new_value(self):
+        self.values_count += 1
+        return self.values_count
+
+    def _get_value(self, operand):
+        if is_variable(operand):
+            if operand not in self.values:
+                # the value of the variable from before the block
+                self._assign(operand, self._new_value())
+
+            return self.values[operand]
+
+        constant = _get_constant(operand, {})
+        key = (type(constant), constant)
+
+        if key not in self.constants:
+            self.constants[key] = self._new_value()
+            self.holders[self.constants[key]] = [constant]
+
+        return self.constants[key]
+
+    def _get_holder(self, value):
+        # the first variable (or constant) which still holds the value
+        for holder in self.holders.get(value, []):
+            if not is_variable(holder) or self.values.get(holder) == value:
+                return holder
+
+        return None
+
+    def _get_operand(self, operand, allow_immediate):
+        # the copy propagation - reading the value from the variable which holds it the longest
+        if not is_variable(operand):
+            return operand
+
+        holder = self._get_holder(self._get_value(operand))
+
+        if holder is None or (not is_variable(holder) and not (allow_immediate and _is_immediate(holder))):
+            return operand
+
+        return holder
+
+    def _assign(self, variable, value):
+        self.values[variable] = value
+        self.holders.setdefault(value, []).append(variable)
+
+def _coalesce_copies(ir):
+    # "t = x op y, v = t" becomes "v = x op y" when t is not read anywhere else, so the expression is computed right into the variable
+    control_flow_graph = ControlFlowGraph(ir)
+    live_out = control_flow_graph.compute_liveness()
+    coalesced_copies = 0
+
+    for block in control_flow_graph.blocks:
+        instructions = list(block.instructions)
+
+        # the variables which are live after every instruction of the block
+        live_after = [None] * len(instructions)
+        live = set(live_out[block.index])
+        for index in reversed(range(len(instructions))):
+            live_after[index] = set(live)
+            live.discard(get_defined_variable(instructions[index]))
+            live.update(get_used_variables(instructions[index]))
+
+        # the index of the last definition and the last read of every variable in the block
+        last_definitions = {}
+        last_uses = {}
+
+        for index, instruction in enumerate(instructions):
+            if instruction is None:
+                continue
+
+            copied_variable = instruction.first_operand
+            defined_variable = get_defined_variable(instruction)
+            definition_index = last_definitions.get(copied_variable)
+
+            if (instruction.operator == "=" and is_variable(copied_variable) and copied_variable != defined_variable and definition_index is not None
+                    and instructions[definition_index].operator in HOISTABLE_OPERATORS
+                    and get_defined_type(instructions[definition_index]) == instruction.type
+                    and last_uses.get(copied_variable, -1) <= definition_index and copied_variable not in live_after[index]
+                    and last_uses.get(defined_variable, -1) <= definition_index and last_definitions.get(defined_variable, -1) < definition_index):
+                definition = instructions[definition_index]
+                instructions[definition_index] = QuadInstruction(definition.operator, definition.type, defined_variable,
+                                                                 definition.first_operand, definition.second_operarnd)
+                instructions[index] = None
+
+                del last_definitions[copied_variable]
+                last_definitions[defined_variable] = definition_index
+                coalesced_copies += 1
+                continue
+
+            for variable in get_used_variables(instruction):
+                last_uses[variable] = index
+
+            if defined_variable:
+                last_definitions[defined_variable] = index
+
+        block.instructions = [instruction for instruction in instructions if instruction is not None]
+
+    return control_flow_graph.get_ir(), coalesced_copies
+
+def hoist_loop_invariants(ir):
+    # moves the computations whose operands do not change inside a loop to right before the loop,
+    #   returns the optimized IR and the number of hoisted instructions
+    control_flow_graph = ControlFlowGraph(ir)
+
+    # a graph without loops needs no further analysis
+    if not control_flow_graph.has_backward_edges():
+        return ir, 0
+
+    dominator_tree = DominatorTree(control_flow_graph)
+    live_out = control_flow_graph.compute_liveness()
+    hoisted_instructions = 0
+
+    # the analysis is built once, since hoisting moves instructions between blocks without changing the graph,
+    #   the innermost loops are handled first so their invariants can be hoisted again out of the enclosing loops
+    for loop in sorted(control_flow_graph.find_loops(dominator_tree), key=lambda loop: len(loop.blocks)):
+        invariants = _get_hoistable_invariants(control_flow_graph, loop, dominator_tree, live_out)
+
+        if not invariants:
+            continue
+
+        # the instructions are placed before the header label, so only the code which falls through to the loop executes them
+        invariants_ids = {id(instruction) for instruction in invariants}
+        for block_index in loop.blocks:
+            block = control_flow_graph.blocks[block_index]
+            block.instructions = [instruction for instruction in block.instructions if id(instruction) not in invariants_ids]
+
+        preheader_index = loop.header.index - 1
+        control_flow_graph.blocks[preheader_index].instructions.extend(invariants)
+        hoisted_instructions += len(invariants)
+
+        # the hoisted variables are now live from the preheader through the whole loop, the liveness is only extended
+        #   (a superset of the live variables just prevents some hoisting), so it is not computed again
+        hoisted_variables = {get_defined_variable(instruction) for instruction in invariants}
+        for block_index in loop.blocks | {preheader_index}:
+            live_out[block_index] |= hoisted_variables
+
+    return control_flow_graph.get_ir(), hoisted_instructions
+
+def _get_hoistable_invariants(control_flow_graph, loop, dominator_tree, live_out):
+    header = loop.header
+
+    # the loop needs a preheader - it must be entered only by falling through from the block before it
+    if header.index == 0 or header.instructions[0].operator != "label":
+        return []
+
+    preheader = control_flow_graph.blocks[header.index - 1]
+    entering_blocks = [predecessor for predecessor in header.predecessors if predecessor.index not in loop.blocks]
+    last_instruction = preheader.last_instruction
+
+    if entering_blocks != [preheader] or (last_instruction.operator in JUMP_OPERATORS and last_instruction.destination == header.instructions[0].destination):
+        return []
+
+    loop_blocks = [control_flow_graph.blocks[block_index] for block_index in sorted(loop.blocks)]
+
+    definitions_counts = {}
+    for block in loop_blocks:
+        for instruction in block.instructions:
+            defined_variable = get_defined_variable(instruction)
+            if defined_variable:
+                definitions_counts[defined_variable] = definitions_counts.get(defined_variable, 0) + 1
+
+    # the variables which are read after leaving the loop from every exiting block
+    exits_live_variables = {}
+    for block in loop_blocks:
+        for successor in block.successors:
+            if successor.index not in loop.blocks:
+                exits_live_variables.setdefault(block.index, set()).update(control_flow_graph.get_live_in(successor, live_out))
+
+    header_live_in = control_flow_graph.get_live_in(header, live_out)
+
+    invariants = []
+    invariant_variables = set()
+
+    changed = True
+    while changed:
+        changed = False
+
+        for block in loop_blocks:
+            for instruction in block.instructions:
+                defined_variable = get_defined_variable(instruction)
+
+                if (defined_variable is None or defined_variable in invariant_variables or instruction.operator not in HOISTABLE_OPERATORS
+                        or _has_side_effects(instruction)):
+                    continue
+
+                # every operand is defined only outside the loop or by an invariant which is hoisted before it
+                if any(variable in definitions_counts and variable not in invariant_variables for variable in get_used_variables(instruction)):
+                    continue
+
+                # the variable gets the hoisted value only, and no read of it in the loop expects its value from before the loop
+                if definitions_counts[defined_variable] != 1 or defined_variable in header_live_in:
+                    continue
+
+                # a variable which is read after the loop must be assigned on every path out of the loop,
+                #   since the hoisted assignment also runs when the loop exits before reaching the original one
+                if any(defined_variable in live_variables and not dominator_tree.dominates(block.index, exiting_block_index)
+                       for exiting_block_index, live_variables in exits_live_variables.items()):
+                    continue
+
+                invariants.append(instruction)
+                invariant_variables.add(defined_variable)
+                changed = True
+
+    return invariants
+
+def eliminate_dead_stores(ir):
+    # removes the assignments to variables which are never read afterwards,
+    #   returns the optimized IR and the number of removed instructions
+    removed_instructions = 0
+
+    # a removed store may be the only use of the variables it reads, so the liveness is computed again until nothing is removed
+    while True:
+        control_flow_graph = ControlFlowGraph(ir)
+        live_out = control_flow_graph.compute_liveness()
+        removed = False
+
+        for block in control_flow_graph.blocks:
+            live = set(live_out[block.index])
+            instructions = []
+
+            for instruction in reversed(block.instructions):
+                defined_variable = get_defined_variable(instruction)
+
+                if defined_variable and defined_variable not in live and not _has_side_effects(instruction):
+                    removed = True
+                    removed_instructions += 1
+                    continue
+
+                live.discard(defined_variable)
+                live.update(get_used_variables(instruction))
+                instructions.append(instruction)
+
+            instructions.reverse()
+            block.instructions = instructions
+
+        ir = control_flow_graph.get_ir()
+
+        if not removed:
+            return ir, removed_instructions
+
+def _has_side_effects(instruction):
+    # the input is consumed even if the read value is never used, and a division by zero stops the program
+    if instruction.operator == "INPUT":
+        return True
+
+    if instruction.operator == "/":
+        divisor = _get_constant(instruction.second_operarnd, {})
+        return divisor is None or divisor == 0
+
+    return False
+
+
+# the folding of every binary operator, according to the semantics of the quad interpreter
+BINARY_OPERATIONS = {
+    "+": lambda type, left, right: left + right,
+    "-": lambda type, left, right: left - right,
+    "*": lambda type, left, right: left * right,
+    "/": lambda type, left, right: left // right if type == SymbolTable.Types.INT else left / right,
+    "==": lambda type, left, right: int(left == right),
+    "!=": lambda type, left, right: int(left != right),
+    "<": lambda type, left, right: int(left < right),
+    ">": lambda type, left, right: int(left > right),
+}
+
+# the immediates of the quad code are unsigned decimal numbers
+IMMEDIATE_RE = re.compile(r"^[0-9]+(\.[0-9]*)?$")
+
+
+def fold_constants(ir):
+    # folds the constant operations and propagates the constants inside every basic block,
+    #   returns the optimized IR and the number of folded or simplified instructions
+    control_flow_graph = ControlFlowGraph(ir)
+    folded_instructions = 0
+
+    for block in control_flow_graph.blocks:
+        constants = {}
+        instructions = []
+
+        for instruction in block.instructions:
+            folded_instruction = _fold_instruction(instruction, constants)
+
+            if folded_instruction is not instruction:
+                folded_instructions += 1
+
+            if folded_instruction is not None:
+                instructions.append(folded_instruction)
+
+        block.instructions = instructions
+
+    return control_flow_graph.get_ir(), folded_instructions
+
+def _fold_instruction(instruction, constants):
+    operator = instruction.operator
+
+    if operator == "jump_zero":
+        condition = _get_constant(instruction.first_operand, constants)
+
+        if condition is None:
+            return instruction
+
+        # a constant condition either always jumps or never jumps
+        return QuadInstruction("jump", SymbolTable.Types.INT, instruction.destination, "", "") if condition == 0 else None
+
+    if operator == "OUTPUT":
+        value = _get_constant(instruction.destination, constants)
+        return QuadInstruction(operator, instruction.type, value, "", "") if _is_immediate(value) else instruction
+
+    defined_variable = get_defined_variable(instruction)
+    if defined_variable is None:
+        return instruction
+
+    # the definition is replaced by an assignment of the constant result, or of the operand for an identity
+    folded_instruction = instruction
+    result = None
+
+    if operator in BINARY_OPERATIONS:
+        left = _get_constant(instruction.first_operand, constants)
+        right = _get_constant(instruction.second_operarnd, constants)
+
+        if left is not None and right is not None and not (operator == "/" and right == 0):
+            result = BINARY_OPERATIONS[operator](instruction.type, left, right)
+        else:
+            identity_operand = _get_identity_operand(instruction, left, right)
+
+            if identity_operand is not None:
+                folded_instruction = QuadInstruction("=", instruction.type, defined_variable, identity_operand, "")
+            else:
+                folded_instruction = _substitute_constants(instruction, left, right)
+    elif operator in ("=", "CAST"):
+        value = _get_constant(instruction.first_operand, constants)
+
+        if value is not None:
+            if operator == "=":
+                result = value
+            else:
+                result = int(value) if instruction.type == SymbolTable.Types.INT else float(value)
+
+    constants.pop(defined_variable, None)
+
+    if result is not None:
+        # a result which cannot be written as an immediate is still propagated, but its instruction is kept
+        constants[defined_variable] = result
+
+        if _is_immediate(result):
+            folded_instruction = QuadInstruction("=", get_defined_type(instruction), defined_variable, result, "")
+
+    # the assignment is kept unchanged if it is already an assignment of the same value
+    if folded_instruction.operator == instruction.operator == "=" and folded_instruction.first_operand == instruction.first_operand:
+        return instruction
+
+    return folded_instruction
+
+def _get_constant(operand, constants):
+    if isinstance(operand, (int, float)):
+        return operand
+
+    if is_variable(operand):
+        return constants.get(operand)
+
+    # a numeric string immediate
+    if operand:
+        return float(operand) if "." in operand else int(operand)
+
+    return None
+
+def _get_identity_operand(instruction, left, right):
+    operator = instruction.operator
+
+    # x + 0 is not x for a real x which is -0.0 (-0.0 + 0.0 is 0.0), while x - 0 is x for every x
+    if operator == "+" and instruction.type == SymbolTable.Types.INT:
+        if right == 0:
+            return instruction.first_operand
+        if left == 0:
+            return instruction.second_operarnd
+    elif operator == "-" and right == 0:
+        return instruction.first_operand
+    elif operator == "*":
+        if right == 1:
+            return instruction.first_operand
+        if left == 1:
+            return instruction.second_operarnd
+    elif operator == "/" and right == 1:
+        return instruction.first_operand
+
+    return None
+
+def _substitute_constants(instruction, left, right):
+    # replacing the operands with their propagated constants
+    first_operand = left if _is_immediate(left) else instruction.first_operand
+    second_operand = right if _is_immediate(right) else instruction.second_operarnd
+
+    if first_operand is instruction.first_operand and second_operand is instruction.second_operarnd:
+        return instruction
+
+    return QuadInstruction(instruction.operator, instruction.type, instruction.destination, first_operand, second_operand)
+
+def _is_immediate(value):
+    return isinstance(value, (int, float)) and IMMEDIATE_RE.match(str(value)) is not None
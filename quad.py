@@ -1,30 +1,192 @@
+from array import array
+from cfg import ControlFlowGraph
 from ir import QuadInstruction
-from symbol_table import SymbolTable
+
+# the comparisons which can be inverted by another comparison, there is no jump if not zero instruction
+INVERTED_COMPARISONS = { "==": "!=", "!=": "==" }
+
+
+class QuadCode:
+    # the final quad code, kept as arrays of interned opcodes and operands instead of an object per instruction
+    OPCODES = sorted(set(QuadInstruction.INSTRUCTION_TRANSLATION_TABLE.values()))
+    OPCODES_IDS = { opcode: opcode_id for opcode_id, opcode in enumerate(OPCODES) }
+
+    def __init__(self):
+        self.opcodes = array("B")
+
+        # three operand indices for every instruction (destination, first operand and second operand)
+        self.operands = array("L")
+        self.operands_table = []
+        self.operands_ids = {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def append(self, opcode, destination, first_operand, second_operand):
+        self.opcodes.append(self.OPCODES_IDS[opcode])
+        self.operands.extend((self._intern(destination), self._intern(first_operand), self._intern(second_operand)))
+
+    def set_destination(self, index, destination):
+        self.operands[3 * index] = self._intern(destination)
+
+    def get_opcode(self, index):
+        return self.OPCODES[self.opcodes[index]]
+
+    def get_operands(self, index):
+        return tuple(self.operands_table[operand_id] for operand_id in self.operands[3 * index:3 * index + 3])
+
+    def get_code(self, index):
+        return "{} {} {} {}".format(self.get_opcode(index), *self.get_operands(index)).strip()
+
+    def lines(self):
+        for index in range(len(self.opcodes)):
+            yield self.get_code(index)
+
+    def _intern(self, operand):
+        # interning by type, otherwise 1 and 1.0 would be interned as the same operand
+        operands_ids = self.operands_ids.setdefault(type(operand), {})
+
+        if operand not in operands_ids:
+            operands_ids[operand] = len(self.operands_table)
+            self.operands_table.append(operand)
+
+        return operands_ids[operand]
 
 
 def get_quad(ir):
-    line_number = 1
-    labels_dictionary = {}
+    result = QuadCode()
+    ir = optimize_jumps(ir)
 
-    quad = []
+    # the line number of every label, and the jumps waiting for a label which was not reached yet (indexed by the label)
+    labels_lines = []
+    labels_backpatches = []
 
-    # removing every label placeholder and registering its line number to alter the jumps
     for instruction in ir:
+        if instruction.operator in ("label", "jump", "jump_zero") and instruction.destination >= len(labels_lines):
+            missing_labels = instruction.destination + 1 - len(labels_lines)
+            labels_lines.extend([None] * missing_labels)
+            labels_backpatches.extend([] for _ in range(missing_labels))
+
         if instruction.operator == "label":
-            labels_dictionary[instruction.destination] = line_number
+            # removing the label placeholder, it refers to the line of the next instruction
+            line_number = len(result) + 1
+            labels_lines[instruction.destination] = line_number
+
+            for index in labels_backpatches[instruction.destination]:
+                result.set_destination(index, line_number)
+
+            labels_backpatches[instruction.destination] = None
+        elif instruction.operator in ("jump", "jump_zero"):
+            # a forward jump is patched once its label is reached
+            line_number = labels_lines[instruction.destination]
+
+            if line_number is None:
+                labels_backpatches[instruction.destination].append(len(result))
+                line_number = ""
+
+            result.append(instruction.instruction, line_number, instruction.first_operand, "")
         else:
-            quad.append(instruction)
-            line_number += 1
+            result.append(instruction.instruction, instruction.destination, instruction.first_operand, instruction.second_operarnd)
     
-    result = []
-
-    # altering the jumps to have offset instead of label placeholders
-    for instruction in quad:
-        if instruction.operator == "jump":
-            result.append(QuadInstruction("jump", SymbolTable.Types.INT, labels_dictionary[instruction.destination], "", ""))
-        elif instruction.operator == "jump_zero":
-            result.append(QuadInstruction("jump_zero", SymbolTable.Types.INT, labels_dictionary[instruction.destination], instruction.first_operand, ""))
+    return result
+
+
+def optimize_jumps(ir):
+    # the peephole optimizations of the jumps, repeated until none of them applies
+    ir = list(ir)
+
+    changed = True
+    while changed:
+        changed = _thread_jumps(ir)
+        ir, removed = _remove_jumps_to_next(ir)
+        ir, inverted = _invert_branches(ir)
+        changed = changed or removed or inverted
+
+    return ir
+
+def _get_labels_targets(ir):
+    # the index of the instruction every label refers to (None for a label at the end of the code)
+    labels_targets = {}
+    next_index = None
+
+    for index in reversed(range(len(ir))):
+        if ir[index].operator == "label":
+            labels_targets[ir[index].destination] = next_index
         else:
-            result.append(instruction)
-    
-    return result
\ No newline at end of file
+            next_index = index
+
+    return labels_targets
+
+def _thread_jumps(ir):
+    # a jump to a jump is replaced by a jump to the final destination
+    labels_targets = _get_labels_targets(ir)
+    changed = False
+
+    for instruction in ir:
+        if instruction.operator not in ("jump", "jump_zero"):
+            continue
+
+        label = instruction.destination
+        visited_labels = {label}
+        target = labels_targets[label]
+
+        # an endless loop of jumps has no final destination
+        while target is not None and ir[target].operator == "jump" and ir[target].destination not in visited_labels:
+            label = ir[target].destination
+            visited_labels.add(label)
+            target = labels_targets[label]
+
+        if label != instruction.destination:
+            instruction.destination = label
+            changed = True
+
+    return changed
+
+def _remove_jumps_to_next(ir):
+    # a jump to one of the labels right after it does nothing, even if it is conditional
+    optimized_ir = []
+
+    for index, instruction in enumerate(ir):
+        if instruction.operator in ("jump", "jump_zero"):
+            next_index = index + 1
+
+            while next_index < len(ir) and ir[next_index].operator == "label" and ir[next_index].destination != instruction.destination:
+                next_index += 1
+
+            if next_index < len(ir) and ir[next_index].operator == "label":
+                continue
+
+        optimized_ir.append(instruction)
+
+    return optimized_ir, len(optimized_ir) != len(ir)
+
+def _invert_branches(ir):
+    # "jump_zero L1 c, jump L2, label L1" becomes "jump_zero L2 !c, label L1", by inverting the comparison which computes c
+    control_flow_graph = None
+    optimized_ir = []
+    index = 0
+
+    while index < len(ir):
+        instruction = ir[index]
+
+        if (instruction.operator == "jump_zero" and optimized_ir and index + 2 < len(ir) and ir[index + 1].operator == "jump"
+                and ir[index + 2].operator == "label" and ir[index + 2].destination == instruction.destination
+                and optimized_ir[-1].operator in INVERTED_COMPARISONS and optimized_ir[-1].destination == instruction.first_operand):
+            if control_flow_graph is None:
+                control_flow_graph = ControlFlowGraph(ir)
+                live_out = control_flow_graph.compute_liveness()
+                blocks_by_last_instruction = { id(block.last_instruction): block.index for block in control_flow_graph.blocks }
+
+            # the condition is changed, so it must not be read after the jump
+            if instruction.first_operand not in live_out[blocks_by_last_instruction[id(instruction)]]:
+                comparison = optimized_ir[-1]
+                optimized_ir[-1] = QuadInstruction(INVERTED_COMPARISONS[comparison.operator], comparison.type, comparison.destination,
+                                                   comparison.first_operand, comparison.second_operarnd)
+                optimized_ir.append(QuadInstruction("jump_zero", instruction.type, ir[index + 1].destination, instruction.first_operand, ""))
+                index += 2
+                continue
+
+        optimized_ir.append(instruction)
+        index += 1
+
+    return optimized_ir, len(optimized_ir) != len(ir)
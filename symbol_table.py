@@ -1,5 +1,5 @@
 from collections import namedtuple
-from lark import Visitor
+from custom_parser import Visitor
 from consts import TOKEN_NAME_ID, TOKEN_NAME_SEMICOLON, TOKEN_NAME_TYPE_INT
 
 from exceptions import CPLException
@@ -88,4 +88,4 @@ class SymbolRedefenitionException(CPLException):
 
 class SymbolUndefinedException(CPLException):
     def __init__(self, name, line_number):
-        super().__init__("Undefined reference to symbol {name}".format(name), line_number)
\ No newline at end of file
+        super().__init__("Undefined reference to symbol {name}".format(name=name), line_number)
\ No newline at end of file
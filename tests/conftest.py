@@ -0,0 +1,40 @@
+import io
+import os
+import sys
+
+import pytest
+
+# the compiler modules and the grammar file live in the root of the repository
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIRECTORY = os.path.join(ROOT_DIRECTORY, "tests")
+
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from tester import BatchIO, QuadInterpreter, QuadProgram
+
+# enough whitespace separated values for every sample that reads input
+SAMPLE_INPUT = "3 7 4 9 2 5 6 8"
+
+
+def get_sample_paths():
+    return sorted(
+        os.path.join(TESTS_DIRECTORY, file_name) for file_name in os.listdir(TESTS_DIRECTORY) if file_name.endswith(".cpl")
+    )
+
+
+def run_quad(quad, input_text="", engine=QuadInterpreter, **options):
+    # runs the compiled quad code with the batch I/O of the quad interpreter, and returns the output lines
+    program = QuadProgram("".join(line + "\n" for line in quad.lines()))
+    output = io.StringIO()
+    quad_io = BatchIO(io.StringIO(input_text), output)
+
+    engine(program, io=quad_io, **options).run()
+    quad_io.flush()
+
+    return output.getvalue().splitlines()
+
+
+@pytest.fixture(autouse=True)
+def root_directory(monkeypatch):
+    # the grammar file is opened by a path relative to the root of the repository
+    monkeypatch.chdir(ROOT_DIRECTORY)
@@ -0,0 +1,94 @@
+"""Compiles a generated CPL program of many statements in every compile mode, and reports the time and the peak memory of each."""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "tree": [],
+    "syntax-directed": ["--syntax-directed"],
+    "tree mmap": ["--mmap"],
+    "syntax-directed mmap": ["--syntax-directed", "--mmap"],
+}
+
+
+def generate_program(statements):
+    # A single long statements list, with a loop and a condition every 100 statements so the control flow is not trivial
+    lines = ["a, b, i: int;", "{"]
+
+    for index in range(statements):
+        if index % 100 == 0:
+            lines.append("    i = 0; while (i < 3) {{ if (a > {}) b = b + 1; else b = b - 1; i = i + 1; }}".format(index))
+        else:
+            lines.append("    a = a + {};".format(index % 7))
+
+    lines.append("    output(a);")
+    lines.append("    output(b);")
+    lines.append("}")
+
+    return "\n".join(lines) + "\n"
+
+
+def compile_program(source_path, flags):
+    # Returns whether the compilation succeeded, its output, its time and its peak memory (in KB)
+    with tempfile.TemporaryFile() as output:
+        start = time.time()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT_DIRECTORY, "cpq.py"), source_path] + flags,
+                                   cwd=ROOT_DIRECTORY, stdout=output, stderr=subprocess.STDOUT)
+
+        # The process is reaped directly, since only wait4 reports the resources it used
+        _, status, resources = os.wait4(process.pid, 0)
+        elapsed = time.time() - start
+
+        output.seek(0)
+        return status == 0, output.read().decode(errors="replace"), elapsed, resources.ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--statements", type=int, default=100000,
+                        help="the number of statements of the generated program")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="compile with the optimizations as well")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        source_path = os.path.join(temporary_directory, "large.cpl")
+        quad_path = os.path.join(temporary_directory, "large.qud")
+
+        with open(source_path, "w") as source_file:
+            source_file.write(generate_program(args.statements))
+
+        quad_codes = {}
+
+        for name, flags in MODES.items():
+            if args.optimize:
+                flags = flags + ["-O"]
+
+            succeeded, output, elapsed, peak_memory = compile_program(source_path, flags)
+
+            if not succeeded:
+                print("{}: failed\n{}".format(name, output.strip().splitlines()[-1] if output.strip() else ""))
+                continue
+
+            with open(quad_path, "r") as quad_file:
+                quad_codes[name] = quad_file.read()
+
+            print("{}: {:.2f}s, {:.1f} MB".format(name, elapsed, peak_memory / 1024))
+
+        # Every mode must generate the same code
+        if len(set(quad_codes.values())) > 1:
+            print("the compile modes generated different code")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
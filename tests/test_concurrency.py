@@ -0,0 +1,50 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import get_sample_paths
+from cpq import compile
+from custom_parser import Parser
+
+THREADS = 16
+
+# every sample is compiled this many times, so the compilations of different samples interleave
+ROUNDS = 4
+
+OPTIONS = {
+    "tree": {},
+    "syntax-directed": {"syntax_directed": True},
+    "optimized short-circuit": {"optimize": True, "short_circuit": True},
+    "syntax-directed optimized": {"syntax_directed": True, "optimize": True},
+}
+
+
+def compile_sample(source, options):
+    errors, quad = compile(source, **options)
+    assert errors == []
+    return list(quad.lines())
+
+
+@pytest.mark.parametrize("options", list(OPTIONS.values()), ids=list(OPTIONS))
+def test_concurrent_compilations_match_serial_compilations(options, monkeypatch):
+    sources = []
+    for path in get_sample_paths():
+        with open(path, "r") as source_file:
+            sources.append(source_file.read())
+
+    serial_results = [compile_sample(source, options) for source in sources]
+
+    # the threads race to build the shared parser as well, and switch as often as possible
+    monkeypatch.setattr(Parser, "lark_parsers", {})
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    try:
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            futures = [executor.submit(compile_sample, source, options) for _ in range(ROUNDS) for source in sources]
+            concurrent_results = [future.result() for future in futures]
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert concurrent_results == serial_results * ROUNDS
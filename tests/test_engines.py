@@ -0,0 +1,120 @@
+import builtins
+import io
+import marshal
+import os
+
+import pytest
+
+from conftest import SAMPLE_INPUT, get_sample_paths, run_quad
+from cpq import compile
+from tester import ENGINES, BatchIO, JitQuadInterpreter, QuadError, QuadProgram
+
+CONFIGURATIONS = [
+    ("loop", "namespace"),
+    ("loop", "slots"),
+    ("closure", "namespace"),
+    ("closure", "slots"),
+    ("jit", "slots"),
+]
+
+# the types of x depend on the path, so they cannot be checked before the program runs
+AMBIGUOUS_TYPES_QUAD = """
+IINP n
+JMPZ 5 n
+RASN x 1.5
+JUMP 6
+IASN x 2
+RPRT 2.5
+IPRT n
+HALT
+"""
+
+# x is assigned only if n is not zero
+MAYBE_UNASSIGNED_QUAD = """
+IINP n
+JMPZ 4 n
+IASN x 1
+IPRT x
+HALT
+"""
+
+
+def run_quad_text(source, input_text, engine, storage):
+    output = io.StringIO()
+    quad_io = BatchIO(io.StringIO(input_text), output)
+
+    try:
+        ENGINES[engine](QuadProgram(source), storage=storage, io=quad_io).run()
+    except QuadError as e:
+        return str(e)
+    finally:
+        quad_io.flush()
+
+    return output.getvalue().splitlines()
+
+
+@pytest.fixture(autouse=True)
+def no_jit_cache(monkeypatch):
+    monkeypatch.setattr(ENGINES["jit"], "cache_dir", "")
+
+
+@pytest.mark.parametrize("engine, storage", CONFIGURATIONS)
+@pytest.mark.parametrize("input_text", ["0", "1"])
+def test_ambiguous_types_run_like_the_namespace(engine, storage, input_text):
+    assert run_quad_text(AMBIGUOUS_TYPES_QUAD, input_text, engine, storage) == \
+        run_quad_text(AMBIGUOUS_TYPES_QUAD, input_text, "loop", "namespace")
+
+
+@pytest.mark.parametrize("engine, storage", CONFIGURATIONS)
+def test_reading_an_unassigned_variable_fails(engine, storage):
+    assert run_quad_text(MAYBE_UNASSIGNED_QUAD, "1", engine, storage) == ["1"]
+    assert run_quad_text(MAYBE_UNASSIGNED_QUAD, "0", engine, storage) == \
+        "5: variable 'x' is used before it is assigned"
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("sample_path", get_sample_paths(), ids=os.path.basename)
+def test_engines_output_the_same(sample_path, optimize):
+    with open(sample_path, "r") as sample_file:
+        errors, quad = compile(sample_file.read(), optimize=optimize)
+
+    assert errors == []
+
+    outputs = [
+        run_quad(quad, SAMPLE_INPUT, engine=ENGINES[engine], storage=storage) for engine, storage in CONFIGURATIONS
+    ]
+    assert outputs == [outputs[0]] * len(outputs)
+
+
+def plant_cached_code(cache_dir, mode):
+    # caches code which outputs something else under the key of MAYBE_UNASSIGNED_QUAD
+    os.mkdir(cache_dir)
+    os.chmod(cache_dir, mode)
+
+    key = JitQuadInterpreter(QuadProgram(MAYBE_UNASSIGNED_QUAD), io=BatchIO(io.StringIO(""), io.StringIO())).cache_key()
+    code = builtins.compile("def quad_program(print_, read, unassigned):\n    print_('planted')\n", "<planted>", "exec")
+
+    with open(os.path.join(cache_dir, key), "wb") as cache_file:
+        marshal.dump(code, cache_file)
+
+
+@pytest.mark.parametrize("mode, trusted", [(0o700, True), (0o755, False), (0o777, False)])
+def test_jit_cache_is_trusted_only_when_private(tmp_path, monkeypatch, mode, trusted):
+    cache_dir = str(tmp_path / "cache")
+    plant_cached_code(cache_dir, mode)
+
+    monkeypatch.setattr(JitQuadInterpreter, "cache_dir", cache_dir)
+    monkeypatch.setattr(JitQuadInterpreter, "code_cache", {})
+
+    assert run_quad_text(MAYBE_UNASSIGNED_QUAD, "1", "jit", "slots") == (["planted"] if trusted else ["1"])
+
+
+def test_jit_cache_is_created_private(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+
+    monkeypatch.setattr(JitQuadInterpreter, "cache_dir", cache_dir)
+    monkeypatch.setattr(JitQuadInterpreter, "code_cache", {})
+
+    assert run_quad_text(MAYBE_UNASSIGNED_QUAD, "1", "jit", "slots") == ["1"]
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+    assert len(os.listdir(cache_dir)) == 1
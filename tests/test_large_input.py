@@ -0,0 +1,16 @@
+from cpq import compile
+from large_input import generate_program
+
+# deeper than the recursion limit, the statements list is a left recursive tree as deep as the program is long
+STATEMENTS = 10000
+
+
+def test_long_program_compiles_in_both_modes():
+    source = generate_program(STATEMENTS)
+
+    tree_errors, tree_quad = compile(source)
+    syntax_directed_errors, syntax_directed_quad = compile(source, syntax_directed=True)
+
+    assert tree_errors == []
+    assert syntax_directed_errors == []
+    assert list(tree_quad.lines()) == list(syntax_directed_quad.lines())
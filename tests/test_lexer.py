@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from conftest import get_sample_paths
+from consts import SOURCE_ENCODING
+from cpq import add_cpl_symbols
+from lexer import Tokenizer
+
+EDGE_CASES = {
+    "empty": "",
+    "whitespace only": " \t\n\n  ",
+    "comments": "/* a comment */ a = 1; /* a comment\nover two lines */ b = 2; /** stars ***/ c",
+    "unterminated comment": "a = 1; /* never closed\n b = 2;",
+    "invalid characters": "a = 1 $ 2; @ # b ? c\n~",
+    "keyword prefixes": "iff int_ intx floaty whilex breaking cases defaults elsewhere inputs outputs switches",
+    "keywords": "break case default else if input output switch while int float",
+    "casts": "static_cast<int>(a) static_cast<float> (b) static_cast<double>(c)",
+    "operators": "a==b!=c>=d<=e>f<g+h-i*j/k||l&&!m = n",
+    "numbers": "0 12 3.5 4. .5 007 1.2.3",
+    "no trailing newline": "a = 1;\nb = 2",
+}
+
+
+def tokenize(source, single_pass):
+    lexer = Tokenizer(single_pass=single_pass)
+    add_cpl_symbols(lexer)
+    return list(lexer.tokenize(source))
+
+
+@pytest.mark.parametrize("source", list(EDGE_CASES.values()), ids=list(EDGE_CASES))
+def test_edge_cases_match_per_pattern_scanner(source):
+    assert tokenize(source, single_pass=True) == tokenize(source, single_pass=False)
+
+
+@pytest.mark.parametrize("path", get_sample_paths(), ids=os.path.basename)
+def test_samples_match_per_pattern_scanner(path):
+    with open(path, "r") as source_file:
+        source = source_file.read()
+
+    tokens = tokenize(source, single_pass=True)
+
+    assert tokens
+    assert tokens == tokenize(source, single_pass=False)
+
+
+@pytest.mark.parametrize("path", get_sample_paths(), ids=os.path.basename)
+def test_bytes_input_matches_string_input(path):
+    # the memory-mapped source is scanned as bytes
+    with open(path, "r") as source_file:
+        source = source_file.read()
+
+    assert tokenize(source.encode(SOURCE_ENCODING), single_pass=True) == tokenize(source, single_pass=True)
+
+
+def test_stream_matches_list():
+    lexer = Tokenizer()
+    add_cpl_symbols(lexer)
+    source = EDGE_CASES["comments"]
+
+    assert list(lexer.tokenize_stream(source)) == list(lexer.tokenize(source))
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from conftest import SAMPLE_INPUT, get_sample_paths, run_quad
+from cpq import compile
+
+NEGATIVE_ZERO_SOURCE = """
+x, y: float;
+{
+    input(x);
+    x = x * (0.0 - 1.0);
+    y = x + 0.0;
+    output(y);
+    y = 0.0 + x;
+    output(y);
+    y = x - 0.0;
+    output(y);
+    y = x * 1.0;
+    output(y);
+}
+"""
+
+
+def compile_and_run(source, input_text, **options):
+    errors, quad = compile(source, **options)
+    assert errors == []
+    return run_quad(quad, input_text)
+
+
+def test_adding_zero_to_a_negative_zero_is_not_an_identity():
+    output = compile_and_run(NEGATIVE_ZERO_SOURCE, "0.0")
+
+    assert output == ["0.0", "0.0", "-0.0", "-0.0"]
+    assert compile_and_run(NEGATIVE_ZERO_SOURCE, "0.0", optimize=True) == output
+
+
+@pytest.mark.parametrize("options", [{}, {"short_circuit": True}, {"syntax_directed": True}])
+@pytest.mark.parametrize("sample_path", get_sample_paths(), ids=os.path.basename)
+def test_optimized_samples_output_the_same(sample_path, options):
+    with open(sample_path, "r") as sample_file:
+        source = sample_file.read()
+
+    output = compile_and_run(source, SAMPLE_INPUT, **options)
+
+    assert compile_and_run(source, SAMPLE_INPUT, optimize=True, **options) == output
@@ -0,0 +1,84 @@
+import os
+import re
+import sys
+
+import pytest
+
+import custom_parser
+from conftest import TESTS_DIRECTORY, get_sample_paths
+from consts import CACHE_DIRECTORY_NAME, GRAMMAR_FILE_PATH
+from cpq import compile
+
+ERRORS_DIRECTORY = os.path.join(TESTS_DIRECTORY, "errors")
+
+# every erroneous sample states the lines of its errors in its first comment
+EXPECTED_ERRORS_RE = re.compile(r"expected errors in lines ([0-9, ]+)")
+
+
+def get_error_sample_paths():
+    return sorted(os.path.join(ERRORS_DIRECTORY, file_name) for file_name in os.listdir(ERRORS_DIRECTORY) if file_name.endswith(".cpl"))
+
+
+def read(path):
+    with open(path, "r") as source_file:
+        return source_file.read()
+
+
+@pytest.mark.parametrize("syntax_directed", [False, True], ids=["tree", "syntax-directed"])
+@pytest.mark.parametrize("path", get_error_sample_paths(), ids=os.path.basename)
+def test_every_error_is_reported(path, syntax_directed):
+    source = read(path)
+    expected_lines = [int(line_number) for line_number in EXPECTED_ERRORS_RE.search(source).group(1).split(",")]
+
+    errors, _ = compile(source, syntax_directed=syntax_directed)
+
+    assert [error.line_number for error in errors] == expected_lines
+
+
+@pytest.mark.parametrize("syntax_directed", [False, True], ids=["tree", "syntax-directed"])
+@pytest.mark.parametrize("path", get_sample_paths(), ids=os.path.basename)
+def test_valid_samples_have_no_errors(path, syntax_directed):
+    errors, _ = compile(read(path), syntax_directed=syntax_directed)
+
+    assert errors == []
+
+
+def build_lark_parser(monkeypatch, cache_home):
+    # builds the parser with Lark even if the standalone parser was generated
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    monkeypatch.setattr(custom_parser, "standalone_parser", None)
+    monkeypatch.setattr(custom_parser.Parser, "lark_parsers", {})
+
+    custom_parser.Parser(read(GRAMMAR_FILE_PATH))
+
+
+def test_lark_cache_is_created_private(tmp_path, monkeypatch):
+    build_lark_parser(monkeypatch, tmp_path)
+
+    cache_directory = tmp_path / CACHE_DIRECTORY_NAME
+    assert cache_directory.stat().st_mode & 0o777 == 0o700
+    assert len(os.listdir(str(cache_directory))) == 1
+
+
+def test_lark_cache_is_skipped_when_shared(tmp_path, monkeypatch):
+    cache_directory = tmp_path / CACHE_DIRECTORY_NAME
+    cache_directory.mkdir()
+    cache_directory.chmod(0o777)
+
+    build_lark_parser(monkeypatch, tmp_path)
+
+    assert os.listdir(str(cache_directory)) == []
+
+
+@pytest.mark.parametrize("digest, loaded", [
+    (custom_parser.standalone_parser_digest, True),
+    # the digest of a module generated by a generator older than STANDALONE_PARSER_VERSION
+    (custom_parser.grammar_digest, False),
+], ids=["current", "outdated"])
+def test_outdated_standalone_parser_is_not_loaded(tmp_path, monkeypatch, digest, loaded):
+    (tmp_path / "generated_parser.py").write_text("GRAMMAR_DIGEST = {!r}\n".format(digest(read(GRAMMAR_FILE_PATH))))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(custom_parser, "STANDALONE_PARSER_MODULE", "generated_parser")
+    monkeypatch.delitem(sys.modules, "generated_parser", raising=False)
+
+    assert (custom_parser.load_standalone_parser() is not None) == loaded
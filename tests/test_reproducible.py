@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT_DIRECTORY, TESTS_DIRECTORY, get_sample_paths
+
+ERRORS_DIRECTORY = os.path.join(TESTS_DIRECTORY, "errors")
+
+MODES = [
+    {},
+    {"optimize": True},
+    {"short_circuit": True},
+    {"syntax_directed": True, "optimize": True, "short_circuit": True},
+]
+
+# compiles every source in every mode, and prints the quad code (or the errors) of each one
+COMPILE_ALL_CODE = """
+import json, sys
+from cpq import compile
+
+MODES = {modes!r}
+
+outputs = {}
+for path in sys.argv[1:]:
+    with open(path, "r") as source_file:
+        source = source_file.read()
+
+    for options in MODES:
+        errors, quad = compile(source, **options)
+        lines = [str(error.line_number) + ": " + error.message for error in errors] if errors else list(quad.lines())
+        outputs[path + " " + json.dumps(options, sort_keys=True)] = "\\n".join(lines)
+
+print(json.dumps(outputs, sort_keys=True))
+"""
+
+
+def compile_all(paths, hash_seed):
+    environment = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    code = COMPILE_ALL_CODE.replace("{modes!r}", repr(MODES))
+
+    result = subprocess.run(
+        [sys.executable, "-c", code] + paths, cwd=ROOT_DIRECTORY, env=environment, stdout=subprocess.PIPE, check=True,
+        universal_newlines=True
+    )
+    return json.loads(result.stdout)
+
+
+def test_output_does_not_depend_on_the_hash_seed():
+    # the string hashes differ between the processes, so any iteration order of a set or a dict of strings differs as well
+    paths = get_sample_paths() + sorted(
+        os.path.join(ERRORS_DIRECTORY, file_name) for file_name in os.listdir(ERRORS_DIRECTORY) if file_name.endswith(".cpl")
+    )
+
+    outputs = compile_all(paths, 1)
+
+    assert len(outputs) == len(paths) * len(MODES)
+    assert compile_all(paths, 2) == outputs
+    assert compile_all(paths, 12345) == outputs
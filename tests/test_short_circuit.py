@@ -0,0 +1,104 @@
+import itertools
+import os
+
+import pytest
+
+from conftest import TESTS_DIRECTORY, run_quad
+from cpq import compile
+
+MODES = [
+    {"short_circuit": True},
+    {"short_circuit": True, "optimize": True},
+    {"short_circuit": True, "syntax_directed": True},
+    {},
+]
+
+# every condition and its value in Python, over the variables a, b and c
+CONDITIONS = [
+    ("a < b", lambda a, b, c: a < b),
+    ("a > b", lambda a, b, c: a > b),
+    ("a <= b", lambda a, b, c: a <= b),
+    ("a >= b", lambda a, b, c: a >= b),
+    ("a == b", lambda a, b, c: a == b),
+    ("a != b", lambda a, b, c: a != b),
+    ("a < b || b < c", lambda a, b, c: a < b or b < c),
+    ("a < b && b < c", lambda a, b, c: a < b and b < c),
+    ("a < b && b < c || a == c", lambda a, b, c: a < b and b < c or a == c),
+    ("a == c || a <= b && b >= c", lambda a, b, c: a == c or a <= b and b >= c),
+    ("!(a < b)", lambda a, b, c: not a < b),
+    ("!(a >= b && b <= c)", lambda a, b, c: not (a >= b and b <= c)),
+    ("!(a == b || !(b != c))", lambda a, b, c: not (a == b or not b != c)),
+    ("a >= b && !(b >= c || a <= c) || c == 0", lambda a, b, c: a >= b and not (b >= c or a <= c) or c == 0),
+]
+
+CONDITIONS_SOURCE = """
+a, b, c, n: int;
+{{
+    input(n);
+    while (n > 0) {{
+        input(a);
+        input(b);
+        input(c);
+{conditions}
+        n = n - 1;
+    }}
+}}
+"""
+
+# the loop runs while i is below n and is not stop, but always runs for i = 0
+WHILE_SOURCE = """
+i, n, stop: int;
+{
+    input(n);
+    input(stop);
+    i = 0;
+    while (i < n && !(i == stop) || i == 0) {
+        output(i);
+        i = i + 1;
+    }
+    while (!(i <= 0)) {
+        i = i - 1;
+        output(i);
+    }
+}
+"""
+
+
+def compile_and_run(source, input_text, **options):
+    errors, quad = compile(source, **options)
+    assert errors == []
+    return run_quad(quad, input_text)
+
+
+@pytest.mark.parametrize("options", MODES)
+def test_andor_sample_prints_the_documented_output(options):
+    with open(os.path.join(TESTS_DIRECTORY, "andor.cpl"), "r") as sample_file:
+        assert compile_and_run(sample_file.read(), "", **options) == ["7", "7", "8", "8"]
+
+
+@pytest.mark.parametrize("options", MODES)
+def test_conditions_have_the_right_value(options):
+    conditions = "".join(
+        "        if ({}) output(1); else output(0);\n".format(condition) for condition, _ in CONDITIONS
+    )
+    values = list(itertools.product(range(3), repeat=3))
+    input_text = " ".join(str(value) for value in [len(values)] + [number for triple in values for number in triple])
+
+    output = compile_and_run(CONDITIONS_SOURCE.format(conditions=conditions), input_text, **options)
+
+    assert output == [str(int(evaluate(*triple))) for triple in values for _, evaluate in CONDITIONS]
+
+
+@pytest.mark.parametrize("options", MODES)
+@pytest.mark.parametrize("n, stop", list(itertools.product(range(4), range(4))))
+def test_while_condition_short_circuits(options, n, stop):
+    expected = []
+    i = 0
+    while i < n and not i == stop or i == 0:
+        expected.append(i)
+        i += 1
+    while not i <= 0:
+        i -= 1
+        expected.append(i)
+
+    assert compile_and_run(WHILE_SOURCE, "{} {}".format(n, stop), **options) == [str(value) for value in expected]
@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import run_quad
+from cpq import compile
+from ir import DENSE_SWITCH_DENSITY, LINEAR_SWITCH_CASES
+
+DEFAULT_OUTPUT = 999
+
+# the case numbers in their order in the switch, and the cases which end with a break (the rest fall through)
+SWITCHES = {
+    "linear": ([3, 1, 2], {1, 2}),
+    "binary search": ([40, 1, 10, 20, 30, 50, 60, 70, 80], {1, 20, 50, 80}),
+    "table with holes": ([5, 1, 2, 3, 6, 7, 8, 10, 11, 12], {2, 3, 7, 10, 12}),
+    "no fall through": ([4, 2, 6, 8, 10], {4, 2, 6, 8, 10}),
+}
+
+
+def generate_switch_program(case_numbers, breaking_cases, default):
+    # runs the switch on every input value, every case outputs its number
+    cases = "".join(
+        "case {number}: output({number});{end}\n".format(number=number, end=" break;" if number in breaking_cases else "")
+        for number in case_numbers
+    )
+    default_code = "output({});".format(DEFAULT_OUTPUT) if default else ""
+
+    return """
+x, n: int;
+{{
+    input(n);
+    while (n > 0) {{
+        input(x);
+        switch (x) {{
+{cases}default: {default_code}
+        }}
+        n = n - 1;
+    }}
+}}
+""".format(cases=cases, default_code=default_code)
+
+
+def get_expected_output(case_numbers, breaking_cases, default, value):
+    # a switch starts at the matching case (or at the default) and falls through the next cases until a break
+    start = case_numbers.index(value) if value in case_numbers else len(case_numbers)
+    output = []
+
+    for number in case_numbers[start:]:
+        output.append(str(number))
+        if number in breaking_cases:
+            return output
+
+    return output + ([str(DEFAULT_OUTPUT)] if default else [])
+
+
+def get_dispatch_strategy(case_numbers, quad):
+    # the linear search has no range comparisons, and the table compares for equality only at the bounds of its range
+    comparisons = [line.split()[0] for line in quad.lines()]
+
+    if "ILSS" not in comparisons:
+        return "linear"
+
+    return "table" if comparisons.count("INQL") <= 2 < len(case_numbers) else "binary search"
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("default", [True, False], ids=["default", "empty default"])
+@pytest.mark.parametrize("name", sorted(SWITCHES))
+def test_switch_runs_the_matching_cases(name, default, optimize):
+    case_numbers, breaking_cases = SWITCHES[name]
+    values = list(range(min(case_numbers) - 2, max(case_numbers) + 3))
+
+    errors, quad = compile(generate_switch_program(case_numbers, breaking_cases, default), optimize=optimize)
+    assert errors == []
+
+    output = run_quad(quad, " ".join(str(value) for value in [len(values)] + values))
+
+    assert output == [line for value in values for line in get_expected_output(case_numbers, breaking_cases, default, value)]
+
+
+@pytest.mark.parametrize("name, strategy", [
+    ("linear", "linear"),
+    ("binary search", "binary search"),
+    ("table with holes", "table"),
+    ("no fall through", "table"),
+])
+def test_switch_uses_the_expected_dispatch(name, strategy):
+    case_numbers, breaking_cases = SWITCHES[name]
+
+    # the samples must stay on the intended side of the thresholds
+    assert (len(case_numbers) <= LINEAR_SWITCH_CASES) == (strategy == "linear")
+    assert (len(case_numbers) >= DENSE_SWITCH_DENSITY * (max(case_numbers) - min(case_numbers) + 1)) == (strategy == "table") \
+        or strategy == "linear"
+
+    errors, quad = compile(generate_switch_program(case_numbers, breaking_cases, True))
+    assert errors == []
+
+    assert get_dispatch_strategy(case_numbers, quad) == strategy
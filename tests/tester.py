@@ -3,8 +3,16 @@
 from __future__ import print_function, division
 import sys
 import io
+import os
 import re
+import stat
 import argparse
+import collections
+import hashlib
+import marshal
+import operator
+import tempfile
+import timeit
 
 
 PY2 = sys.version_info[0] == 2
@@ -58,8 +66,35 @@ class QuadInst(object):
 
 
 class QuadProgram(object):
+    # How every instruction accesses its operands: "r" reads, "w" writes, "j" is a jump target, and the type
+    # of the access (None for the type of the instruction)
+    OPERANDS = {
+        "ASN": (("w", None), ("r", None)),
+        "PRT": (("r", None),),
+        "INP": (("w", None),),
+        "EQL": (("w", int), ("r", None), ("r", None)),
+        "NQL": (("w", int), ("r", None), ("r", None)),
+        "LSS": (("w", int), ("r", None), ("r", None)),
+        "GRT": (("w", int), ("r", None), ("r", None)),
+        "ADD": (("w", None), ("r", None), ("r", None)),
+        "SUB": (("w", None), ("r", None), ("r", None)),
+        "MLT": (("w", None), ("r", None), ("r", None)),
+        "DIV": (("w", None), ("r", None), ("r", None)),
+        "ITOR": (("w", float), ("r", int)),
+        "RTOI": (("w", int), ("r", float)),
+        "JUMP": (("j", None),),
+        "JMPZ": (("j", None), ("r", int)),
+        "HALT": (),
+    }
+
+    TYPES = {"I": int, "R": float}
+
     def __init__(self, src):
         self.code = []
+        self.slots = None
+        self.slot_types = None
+        self.unassigned_reads = None
+        self.checked = None
 
         if isinstance(src, str):
             src = io.StringIO(src)
@@ -82,6 +117,162 @@ class QuadProgram(object):
     def __repr__(self):
         return "<QuadProgram: {} instructions>".format(len(self.code))
 
+    def operand_accesses(self, inst):
+        if inst.op in self.OPERANDS:
+            accesses = self.OPERANDS[inst.op]
+        elif inst.op[:1] in self.TYPES and inst.op[1:] in self.OPERANDS:
+            type_ = self.TYPES[inst.op[0]]
+            accesses = tuple((access, access_type or type_) for access, access_type in self.OPERANDS[inst.op[1:]])
+        else:
+            raise QuadError(inst.lineno, "unknown op: '{}'".format(inst.op))
+
+        if len(inst.opers) < len(accesses):
+            raise QuadError(inst.lineno, "missing operands for '{}'".format(inst.op))
+
+        return zip(accesses, inst.opers)
+
+    def assign_slots(self):
+        # Returns whether the program was checked once here, so its variables can live in fixed slots without
+        # checking them on every access, except for the reads which may come before an assignment. Programs
+        # whose types or jumps are only known at run time are left to the namespace, which checks them as they
+        # execute.
+        if self.checked is None:
+            try:
+                self.slots, self.slot_types = self.check_types()
+                self.unassigned_reads = self.find_unassigned_reads()
+                self.checked = self.unassigned_reads is not None
+            except QuadError:
+                self.checked = False
+
+        return self.checked
+
+    def check_types(self):
+        # Every identifier gets a fixed slot, and its type is the type of its first assignment in the code
+        slots, slot_types, declarations = {}, [], []
+
+        for inst in self.code:
+            for (access, type_), oper in self.operand_accesses(inst):
+                if access == "j":
+                    continue
+
+                if not isinstance(oper, str):
+                    # The condition of JMPZ is read through the namespace, so it must be an identifier as well
+                    if access == "w" or inst.op == "JMPZ":
+                        raise QuadError(inst.lineno, "invalid identifier '{}'".format(oper))
+
+                    if not is_type(oper, type_):
+                        raise QuadError(
+                            inst.lineno,
+                            "type mismatch for operand, expected {}, found {}".format(
+                                type_.__name__, type(oper).__name__))
+
+                    continue
+
+                if oper not in slots:
+                    slots[oper] = len(slot_types)
+                    slot_types.append(None)
+                    declarations.append(None)
+
+                if access == "w" and slot_types[slots[oper]] is None:
+                    slot_types[slots[oper]] = type_
+                    declarations[slots[oper]] = inst.lineno
+
+        for inst in self.code:
+            for (access, type_), oper in self.operand_accesses(inst):
+                if access == "j" or not isinstance(oper, str):
+                    continue
+
+                slot = slots[oper]
+                if slot_types[slot] is None:
+                    raise QuadError(inst.lineno, "variable '{}' is never assigned".format(oper))
+
+                if slot_types[slot] is not type_:
+                    raise QuadError(
+                        inst.lineno,
+                        "type mismatch for variable '{}' (declared at line {}), "
+                        "expected {}, found {}".format(
+                            oper, declarations[slot], type_.__name__, slot_types[slot].__name__))
+
+        return slots, slot_types
+
+    def find_unassigned_reads(self):
+        # The variables which may be read before they are assigned on some path, by the pc of every such read,
+        # or None if the control flow is not known. Only the variables which some basic block reads before
+        # writing them are tracked, as bits of the set of the definitely assigned variables of every block.
+        code = self.code
+        leaders = set([1])
+
+        for pc, inst in enumerate(code, 1):
+            if inst.op in ("JUMP", "JMPZ"):
+                target = inst.opers[0]
+                if not (isinstance(target, int) and 1 <= target <= len(code)):
+                    return None
+
+                leaders.add(target)
+                leaders.add(pc + 1)
+
+        leaders = sorted(leader for leader in leaders if leader <= len(code))
+        block_indices = dict((leader, index) for index, leader in enumerate(leaders))
+        blocks, bits = [], {}
+
+        for index, leader in enumerate(leaders):
+            end = leaders[index + 1] if index + 1 < len(leaders) else len(code) + 1
+            written = set()
+
+            for pc in range(leader, end):
+                accesses = list(self.operand_accesses(code[pc - 1]))
+                # An instruction reads its operands before it writes its destination
+                for (access, _), oper in accesses:
+                    if access == "r" and isinstance(oper, str) and oper not in written:
+                        bits.setdefault(oper, 1 << len(bits))
+
+                written.update(oper for (access, _), oper in accesses if access == "w")
+
+            last = code[end - 2]
+            if last.op == "JUMP":
+                successors = [last.opers[0]]
+            elif last.op == "JMPZ":
+                successors = [last.opers[0], end]
+            elif last.op == "HALT":
+                successors = []
+            else:
+                successors = [end]
+
+            successors = [block_indices[successor] for successor in successors if successor <= len(code)]
+            blocks.append((leader, end, written, successors))
+
+        if not bits:
+            return {}
+
+        generated = [sum(bits[name] for name in written if name in bits) for _, _, written, _ in blocks]
+
+        # The unreachable blocks keep every bit, since they never read anything
+        assigned = [(1 << len(bits)) - 1] * len(blocks)
+        assigned[0] = 0
+        worklist = list(range(len(blocks)))
+
+        while worklist:
+            index = worklist.pop()
+            out = assigned[index] | generated[index]
+
+            for successor in blocks[index][3]:
+                if successor != 0 and assigned[successor] & out != assigned[successor]:
+                    assigned[successor] &= out
+                    worklist.append(successor)
+
+        unassigned_reads = {}
+
+        for (leader, end, _, _), block_assigned in zip(blocks, assigned):
+            for pc in range(leader, end):
+                accesses = list(self.operand_accesses(code[pc - 1]))
+
+                for (access, _), oper in accesses:
+                    if access == "r" and isinstance(oper, str) and oper in bits and not bits[oper] & block_assigned:
+                        unassigned_reads.setdefault(pc, []).append(oper)
+
+                block_assigned |= sum(bits.get(oper, 0) for (access, _), oper in accesses if access == "w")
+
+        return unassigned_reads
 
 def is_type(value, type_):
     if PY2 and type_ is int:
@@ -90,6 +281,10 @@ def is_type(value, type_):
     return isinstance(value, type_)
 
 
+def unassigned_error(lineno, name):
+    return QuadError(lineno, "variable '{}' is used before it is assigned".format(name))
+
+
 class Namespace(object):
     class Entry(object):
         def __init__(self, lineno, value):
@@ -109,16 +304,18 @@ class Namespace(object):
         return self._lookup(lineno, type_, name).value
 
     def set(self, lineno, type_, name, value):
-        try:
-            self._lookup(lineno, type_, name).value = value
-        except KeyError:
+        if isinstance(name, str) and name not in self._ns:
             self._ns[name] = self.Entry(lineno, value)
+        else:
+            self._lookup(lineno, type_, name).value = value
 
     def _lookup(self, lineno, type_, name):
         if not isinstance(name, str):
             raise QuadError(lineno, "invalid identifier '{}'".format(name))
 
-        entry = self._ns[name]
+        entry = self._ns.get(name)
+        if entry is None:
+            raise unassigned_error(lineno, name)
 
         if not is_type(entry.value, type_):
             raise QuadError(
@@ -130,13 +327,115 @@ class Namespace(object):
         return entry
 
 
+class SlotNamespace(object):
+    """A namespace whose variables live in a flat list, indexed by the slots the program assigned them."""
+
+    def __init__(self, prog):
+        self.slots = prog.slots
+        self.values = [None] * len(prog.slots)
+
+    def __repr__(self):
+        return "SlotNamespace({!r})".format(dict((name, self.values[slot]) for name, slot in self.slots.items()))
+
+    # The types were already checked by QuadProgram.assign_slots
+    def get(self, lineno, type_, name):
+        value = self.values[self.slots[name]]
+        if value is None:
+            raise unassigned_error(lineno, name)
+
+        return value
+
+    def set(self, lineno, type_, name, value):
+        self.values[self.slots[name]] = value
+
+
+STORAGES = {
+    "namespace": lambda prog: Namespace(),
+    "slots": lambda prog: SlotNamespace(prog) if prog.assign_slots() else Namespace(),
+}
+
+
+class InputError(Exception):
+    pass
+
+
+class ConsoleIO(object):
+    """Interactive I/O, prompting for every input value until it is valid."""
+
+    def read(self, type_, name):
+        while True:
+            try:
+                return type_(input("{} ({})? ".format(name, type_.__name__)))
+            except ValueError:
+                print("Invalid input!")
+
+    def write(self, value):
+        print(value)
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+class BatchIO(object):
+    """Non-interactive I/O, reading whitespace separated values without prompts and buffering the output until HALT."""
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, input_stream, output_stream):
+        self.tokens = self.tokenize(input_stream)
+        self.output_stream = output_stream
+        self.output = []
+        # A builtin method, so printing a value costs no Python call
+        self.write = self.output.append
+
+    def tokenize(self, stream):
+        rest = ""
+        while True:
+            chunk = stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+
+            # The last token may continue in the next chunk
+            tokens = (rest + chunk).split()
+            rest = tokens.pop() if tokens and not chunk[-1].isspace() else ""
+
+            for token in tokens:
+                yield token
+
+        if rest:
+            yield rest
+
+    def read(self, type_, name):
+        try:
+            token = next(self.tokens)
+        except StopIteration:
+            raise InputError("end of input while reading '{}' ({})".format(name, type_.__name__))
+
+        try:
+            return type_(token)
+        except ValueError:
+            raise InputError("invalid input '{}' for '{}' ({})".format(token, name, type_.__name__))
+
+    def flush(self):
+        if self.output:
+            self.output_stream.write("".join("{}\n".format(value) for value in self.output))
+            del self.output[:]
+
+        self.output_stream.flush()
+
+
 class QuadInterpreter(object):
-    def __init__(self, prog, trace=False):
+    def __init__(self, prog, trace=False, storage="namespace", profile=False, io=None):
         self.prog = prog
         self.code = prog.code
         self.trace = trace
         self.pc = 1
-        self.ns = Namespace()
+        self.ns = STORAGES[storage](prog)
+        self.io = io or ConsoleIO()
+
+        # The number of times every op was executed, and every superinstruction with the number of its sites
+        self.profile = collections.Counter() if profile else None
+        self.superinstructions = {}
 
     def run(self):
         while True:
@@ -146,6 +445,8 @@ class QuadInterpreter(object):
             inst = self.code[self.pc - 1]
             if self.trace:
                 print("#{} {}".format(self.pc, inst), file=sys.stderr)
+            if self.profile is not None:
+                self.profile[inst.op] += 1
             self.pc += 1
 
             try:
@@ -171,17 +472,10 @@ class QuadInterpreter(object):
         self.ns.set(inst.lineno, type_, inst.opers[0], self.val(inst.lineno, type_, inst.opers[1]))
 
     def do_PRT(self, type_, inst):
-        print(self.val(inst.lineno, type_, inst.opers[0]))
+        self.io.write(self.val(inst.lineno, type_, inst.opers[0]))
 
     def do_INP(self, type_, inst):
-        while True:
-            try:
-                value = type_(input("{} ({})? ".format(inst.opers[0], type_.__name__)))
-                break
-            except ValueError:
-                print("Invalid input!")
-
-        self.ns.set(inst.lineno, type_, inst.opers[0], value)
+        self.ns.set(inst.lineno, type_, inst.opers[0], self.io.read(type_, inst.opers[0]))
 
     def do_EQL(self, type_, inst):
         self.ns.set(
@@ -278,24 +572,718 @@ class QuadInterpreter(object):
     def eval_HALT(self, inst):
         self.pc = None
 
+    def print_profile(self, file=sys.stderr):
+        print("Executed ops:", file=file)
+        for name, count in sorted(self.profile.items(), key=lambda item: (-item[1], item[0])):
+            if name not in self.superinstructions:
+                print("  {:<20} {:>12}".format(name, count), file=file)
+
+        if self.superinstructions:
+            print("Superinstructions:", file=file)
+            for name, sites in sorted(self.superinstructions.items()):
+                print("  {:<20} {:>12} hits ({} sites)".format(name, self.profile[name], sites), file=file)
+
+
+class ClosureQuadInterpreter(QuadInterpreter):
+    """Runs the program after decoding every instruction once into a closure which returns the next pc."""
+
+    BINARY_OPS = {
+        "EQL": (operator.eq, int),
+        "NQL": (operator.ne, int),
+        "LSS": (operator.lt, int),
+        "GRT": (operator.gt, int),
+        "ADD": (operator.add, None),
+        "SUB": (operator.sub, None),
+        "MLT": (operator.mul, None),
+    }
+
+    TYPE_PREFIXES = {"I": int, "R": float}
+
+    # The instruction sequences which the compiler emits for every condition, fused into a single op (longest first)
+    SUPERINSTRUCTIONS = (
+        ("add+positive+JMPZ", "fuse_add_positive_jmpz"),
+        ("compare+JMPZ", "fuse_compare_jmpz"),
+        ("add+positive", "fuse_add_positive"),
+        ("assign+JUMP", "fuse_assign_jump"),
+    )
+
+    def __init__(self, prog, trace=False, storage="namespace", profile=False, io=None):
+        super(ClosureQuadInterpreter, self).__init__(prog, trace, storage, profile, io)
+        self.ops = [None] + [self.compile_inst(pc, inst) for pc, inst in enumerate(self.code, 1)]
+        names = [None] + [inst.op for inst in self.code]
+
+        if isinstance(self.ns, SlotNamespace):
+            # Only the checked programs are fused, so the fused ops need no type checks either
+            for pc in range(1, len(self.code) + 1):
+                if pc in prog.unassigned_reads:
+                    continue
+
+                for name, fuse in self.SUPERINSTRUCTIONS:
+                    op = getattr(self, fuse)(pc)
+                    if op is not None:
+                        self.ops[pc], names[pc] = op, name
+                        self.superinstructions[name] = self.superinstructions.get(name, 0) + 1
+                        break
+
+        if self.profile is not None:
+            self.ops = [None] + [self.count_op(op, name) for op, name in zip(self.ops[1:], names[1:])]
+
+    def run(self):
+        if self.trace:
+            return super(ClosureQuadInterpreter, self).run()
+
+        ops = self.ops
+        pc = self.pc
+
+        while pc is not None:
+            pc = ops[pc]()
+
+        self.pc = None
+
+    def compile_inst(self, pc, inst):
+        if isinstance(self.ns, SlotNamespace) and pc not in self.prog.unassigned_reads:
+            # The program was already checked, so every instruction is well formed and well typed
+            return self.compile_slots(pc, inst)
+
+        if isinstance(self.ns, SlotNamespace):
+            # The reads which may come before an assignment go through the slots namespace, which checks them
+            return self.compile_fast(pc, inst)
+
+        try:
+            return self.compile_fast(pc, inst)
+        except (IndexError, KeyError):
+            # Malformed or unknown instructions run through the regular eval_* methods, so they fail exactly the same way
+            return self.compile_slow(pc, inst)
+
+    def compile_slow(self, pc, inst):
+        def op():
+            self.pc = pc + 1
+
+            try:
+                eval_inst = getattr(self, "eval_" + inst.op)
+            except AttributeError:
+                raise QuadError(inst.lineno, "unknown op: '{}'".format(inst.op))
+
+            eval_inst(inst)
+            return self.pc
+
+        return op
+
+    def compile_read(self, lineno, type_, oper):
+        if isinstance(oper, str):
+            get = self.ns.get
+            return lambda: get(lineno, type_, oper)
+
+        if not is_type(oper, type_):
+            error = QuadError(
+                lineno,
+                "type mismatch for operand, expected {}, found {}".format(
+                    type_.__name__, type(oper).__name__))
+
+            def read():
+                raise error
+
+            return read
+
+        return lambda: oper
+
+    def compile_fast(self, pc, inst):
+        op, opers, lineno = inst.op, inst.opers, inst.lineno
+        set_ = self.ns.set
+        next_pc = pc + 1
+
+        if op == "HALT":
+            return lambda: None
+
+        if op in ("JUMP", "JMPZ"):
+            target = opers[0]
+            if not isinstance(target, int):
+                return self.compile_slow(pc, inst)
+
+            if op == "JUMP":
+                return lambda: target
+
+            get, cond = self.ns.get, opers[1]
+            return lambda: target if get(lineno, int, cond) == 0 else next_pc
+
+        if op in ("ITOR", "RTOI"):
+            from_type, to_type = (int, float) if op == "ITOR" else (float, int)
+            dest, read = opers[0], self.compile_read(lineno, from_type, opers[1])
+
+            def convert():
+                set_(lineno, to_type, dest, to_type(read()))
+                return next_pc
+
+            return convert
+
+        type_, kind = self.TYPE_PREFIXES[op[0]], op[1:]
+        dest = opers[0]
+
+        if kind == "ASN":
+            read = self.compile_read(lineno, type_, opers[1])
+
+            def assign():
+                set_(lineno, type_, dest, read())
+                return next_pc
+
+            return assign
+
+        if kind == "PRT":
+            read = self.compile_read(lineno, type_, dest)
+            write = self.io.write
+
+            def output():
+                write(read())
+                return next_pc
+
+            return output
+
+        if kind == "INP":
+            def input_():
+                self.do_INP(type_, inst)
+                return next_pc
+
+            return input_
+
+        if kind == "DIV":
+            func, result_type = (operator.floordiv if type_ is int else operator.truediv), None
+        else:
+            func, result_type = self.BINARY_OPS[kind]
+
+        result_type = result_type or type_
+        read1 = self.compile_read(lineno, type_, opers[1])
+        read2 = self.compile_read(lineno, type_, opers[2])
+
+        def binary():
+            set_(lineno, result_type, dest, func(read1(), read2()))
+            return next_pc
+
+        return binary
+
+    def compile_slots(self, pc, inst):
+        op, opers = inst.op, inst.opers
+        values, slots = self.ns.values, self.ns.slots
+        next_pc = pc + 1
+
+        if op == "HALT":
+            return lambda: None
+
+        if op in ("JUMP", "JMPZ"):
+            target = opers[0]
+            if not isinstance(target, int):
+                return self.compile_slow(pc, inst)
+
+            if op == "JUMP":
+                return lambda: target
+
+            cond = slots[opers[1]]
+            return lambda: target if values[cond] == 0 else next_pc
+
+        read, write = self.io.read, self.io.write
+
+        if op[1:] == "INP":
+            type_, name, dest = self.TYPE_PREFIXES[op[0]], opers[0], slots[opers[0]]
+
+            def input_slot():
+                values[dest] = read(type_, name)
+                return next_pc
+
+            return input_slot
+
+        dest = opers[0]
+
+        if op[1:] == "PRT":
+            if not isinstance(dest, str):
+                return lambda: write(dest) or next_pc
+
+            src = slots[dest]
+            return lambda: write(values[src]) or next_pc
+
+        dest = slots[dest]
+
+        if op in ("ITOR", "RTOI") or op[1:] == "ASN":
+            convert = {"ITOR": float, "RTOI": int}.get(op)
+            oper = opers[1]
+
+            if not isinstance(oper, str):
+                value = convert(oper) if convert else oper
+
+                def assign_const():
+                    values[dest] = value
+                    return next_pc
+
+                return assign_const
+
+            src = slots[oper]
+
+            if convert:
+                def convert_slot():
+                    values[dest] = convert(values[src])
+                    return next_pc
+
+                return convert_slot
+
+            def assign_slot():
+                values[dest] = values[src]
+                return next_pc
+
+            return assign_slot
+
+        if op[1:] == "DIV":
+            func = operator.floordiv if op[0] == "I" else operator.truediv
+        else:
+            func = self.BINARY_OPS[op[1:]][0]
+
+        oper1, oper2 = opers[1], opers[2]
+
+        if isinstance(oper1, str) and isinstance(oper2, str):
+            src1, src2 = slots[oper1], slots[oper2]
+
+            def binary_slots():
+                values[dest] = func(values[src1], values[src2])
+                return next_pc
+
+            return binary_slots
+
+        if isinstance(oper1, str):
+            src1 = slots[oper1]
+
+            def binary_slot_const():
+                values[dest] = func(values[src1], oper2)
+                return next_pc
+
+            return binary_slot_const
+
+        if isinstance(oper2, str):
+            src2 = slots[oper2]
+
+            def binary_const_slot():
+                values[dest] = func(oper1, values[src2])
+                return next_pc
+
+            return binary_const_slot
+
+        def binary_consts():
+            values[dest] = func(oper1, oper2)
+            return next_pc
+
+        return binary_consts
+
+    def count_op(self, op, name):
+        profile = self.profile
+
+        def counted():
+            profile[name] += 1
+            return op()
+
+        return counted
+
+    # Every fused op replaces only the op of the first instruction of its sequence, the rest keep their own ops,
+    # so jumping into the middle of a sequence still works. The fused op writes every destination the sequence
+    # writes, since they may still be read later.
+
+    def match(self, pc, *ops):
+        # The instructions starting at pc, if their ops are the given ones (None matches any op)
+        insts = self.code[pc - 1:pc - 1 + len(ops)]
+        if len(insts) < len(ops) or any(op is not None and inst.op != op for inst, op in zip(insts, ops)):
+            return None
+
+        return insts
+
+    def is_branch_on(self, inst, dest):
+        return inst.op == "JMPZ" and isinstance(inst.opers[0], int) and inst.opers[1] == dest
+
+    def fuse_compare_jmpz(self, pc):
+        insts = self.match(pc, None, "JMPZ")
+        if insts is None or insts[0].op[1:] not in ("EQL", "NQL", "LSS", "GRT"):
+            return None
+
+        compare, branch = insts
+        dest, oper1, oper2 = compare.opers[:3]
+        if not self.is_branch_on(branch, dest):
+            return None
+
+        func = self.BINARY_OPS[compare.op[1:]][0]
+        values, slots = self.ns.values, self.ns.slots
+        dest, target, next_pc = slots[dest], branch.opers[0], pc + 2
+
+        if isinstance(oper1, str) and isinstance(oper2, str):
+            src1, src2 = slots[oper1], slots[oper2]
+
+            def compare_slots_jmpz():
+                values[dest] = result = func(values[src1], values[src2])
+                return next_pc if result else target
+
+            return compare_slots_jmpz
+
+        if isinstance(oper1, str):
+            src1 = slots[oper1]
+
+            def compare_slot_const_jmpz():
+                values[dest] = result = func(values[src1], oper2)
+                return next_pc if result else target
+
+            return compare_slot_const_jmpz
+
+        if isinstance(oper2, str):
+            src2 = slots[oper2]
+
+            def compare_const_slot_jmpz():
+                values[dest] = result = func(oper1, values[src2])
+                return next_pc if result else target
+
+            return compare_const_slot_jmpz
+
+        return None
+
+    def match_add_positive(self, pc, *ops):
+        # The lowering of || and >=: t = x + y; t = t > 0
+        insts = self.match(pc, "IADD", "IGRT", *ops)
+        if insts is None:
+            return None
+
+        add, positive = insts[:2]
+        dest = add.opers[0]
+        if positive.opers[:3] != [dest, dest, 0] or not all(isinstance(oper, str) for oper in add.opers[1:3]):
+            return None
+
+        return insts
+
+    def fuse_add_positive(self, pc):
+        insts = self.match_add_positive(pc)
+        if insts is None:
+            return None
+
+        values, slots = self.ns.values, self.ns.slots
+        dest, src1, src2 = [slots[oper] for oper in insts[0].opers[:3]]
+        next_pc = pc + 2
+
+        def add_positive():
+            values[dest] = values[src1] + values[src2] > 0
+            return next_pc
+
+        return add_positive
+
+    def fuse_add_positive_jmpz(self, pc):
+        insts = self.match_add_positive(pc, "JMPZ")
+        if insts is None or not self.is_branch_on(insts[2], insts[0].opers[0]):
+            return None
+
+        values, slots = self.ns.values, self.ns.slots
+        dest, src1, src2 = [slots[oper] for oper in insts[0].opers[:3]]
+        target, next_pc = insts[2].opers[0], pc + 3
+
+        def add_positive_jmpz():
+            values[dest] = result = values[src1] + values[src2] > 0
+            return next_pc if result else target
+
+        return add_positive_jmpz
+
+    def fuse_assign_jump(self, pc):
+        insts = self.match(pc, None, "JUMP")
+        if insts is None or insts[0].op[1:] != "ASN" or not isinstance(insts[1].opers[0], int):
+            return None
+
+        values, slots = self.ns.values, self.ns.slots
+        dest, oper = slots[insts[0].opers[0]], insts[0].opers[1]
+        target = insts[1].opers[0]
+
+        if not isinstance(oper, str):
+            def assign_const_jump():
+                values[dest] = oper
+                return target
+
+            return assign_const_jump
+
+        src = slots[oper]
+
+        def assign_slot_jump():
+            values[dest] = values[src]
+            return target
+
+        return assign_slot_jump
+
+
+# Bump when the generated code changes, so cached code of older versions is not used
+JIT_VERSION = 2
+
+
+class JitQuadInterpreter(QuadInterpreter):
+    """Runs the program as a single generated Python function, whose locals are the variables of the program."""
+
+    # The generated code relies on the types and assignments checked by QuadProgram.assign_slots, the unchecked
+    # programs run through the interpreter loop with the namespace instead
+    STORAGES = ("slots",)
+
+    BINARY_OPS = {
+        "EQL": "==",
+        "NQL": "!=",
+        "LSS": "<",
+        "GRT": ">",
+        "ADD": "+",
+        "SUB": "-",
+        "MLT": "*",
+    }
+
+    # The cached code is executed, so it is kept in a directory of the user, never in a shared one
+    cache_dir = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "quad_jit")
+    code_cache = {}
+
+    def __init__(self, prog, trace=False, storage="slots", profile=False, io=None):
+        super(JitQuadInterpreter, self).__init__(prog, trace, "slots", profile, io)
+        self.function = self.load_function() if isinstance(self.ns, SlotNamespace) else None
+
+    def run(self):
+        # The generated code counts nothing, so profiling runs through the interpreter loop like tracing
+        if self.function is None or self.trace or self.profile is not None:
+            return super(JitQuadInterpreter, self).run()
+
+        self.function(self.io.write, self.io.read, self.unassigned)
+        self.pc = None
+
+    def unassigned(self, lineno, name):
+        raise unassigned_error(lineno, name)
+
+    def cache_key(self):
+        return hashlib.sha256("{}\n{}\n{}".format(
+            JIT_VERSION, sys.version, "\n".join(inst.inst for inst in self.code)).encode("utf-8")).hexdigest()
+
+    def load_function(self):
+        # The compiled code is cached in memory and on disk, keyed by the hash of the program
+        key = self.cache_key()
+        code = self.code_cache.get(key)
+
+        if code is None:
+            code = self.load_cached_code(key)
+
+        if code is None:
+            code = compile(self.generate_source(), "<quad {}>".format(key[:12]), "exec")
+            self.store_cached_code(key, code)
+
+        self.code_cache[key] = code
+
+        namespace = {}
+        exec(code, namespace)
+        return namespace["quad_program"]
+
+    def is_cache_private(self):
+        # Only a directory of the current user, which no other user can write to, is trusted
+        try:
+            status = os.lstat(self.cache_dir)
+        except OSError:
+            return False
+
+        if not stat.S_ISDIR(status.st_mode):
+            return False
+
+        return not hasattr(os, "getuid") or (status.st_uid == os.getuid() and not status.st_mode & 0o077)
+
+    def load_cached_code(self, key):
+        if not self.cache_dir or not self.is_cache_private():
+            return None
+
+        try:
+            with open(os.path.join(self.cache_dir, key), "rb") as f:
+                return marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def store_cached_code(self, key, code):
+        if not self.cache_dir:
+            return
+
+        # Written to a temporary file first, so a concurrent run never reads a partial file
+        try:
+            if not os.path.lexists(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o700)
+
+            if not self.is_cache_private():
+                return
+
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(code, f)
+
+            os.rename(temp_path, os.path.join(self.cache_dir, key))
+        except (IOError, OSError):
+            pass
+
+    def generate_source(self):
+        # Every basic block is a region of a block dispatch loop, and a jump sets the next block
+        leaders = set([1])
+        for pc, inst in enumerate(self.code, 1):
+            if inst.op in ("JUMP", "JMPZ"):
+                leaders.add(inst.opers[0])
+                leaders.add(pc + 1)
+
+        leaders = sorted(leader for leader in leaders if leader <= len(self.code))
+        blocks = []
+
+        for index, leader in enumerate(leaders):
+            end = leaders[index + 1] if index + 1 < len(leaders) else len(self.code) + 1
+            lines = []
+
+            for pc in range(leader, end):
+                inst = self.code[pc - 1]
+                lines.append("# {}: {}".format(pc, inst))
+                for name in self.prog.unassigned_reads.get(pc, ()):
+                    lines.append("if v_{} is None: unassigned({}, {!r})".format(name, inst.lineno, name))
+                lines.append(self.generate_inst(pc, inst))
+
+            if self.code[end - 2].op not in ("JUMP", "JMPZ", "HALT"):
+                lines.append("block = {}".format(end))
+
+            blocks.append((leader, lines))
+
+        source = ["def quad_program(print_, read, unassigned):"]
+        if self.prog.slots:
+            source.append("    {} = None".format(" = ".join("v_" + name for name in sorted(self.prog.slots))))
+
+        source.append("    block = 1")
+        source.append("    while True:")
+        self.generate_dispatch(blocks, 2, source)
+
+        return "\n".join(source) + "\n"
+
+    def generate_dispatch(self, blocks, depth, source):
+        # A binary decision tree over the blocks numbers
+        indent = "    " * depth
+
+        if len(blocks) == 1:
+            source.extend(indent + line for line in blocks[0][1])
+            return
+
+        middle = len(blocks) // 2
+        source.append("{}if block < {}:".format(indent, blocks[middle][0]))
+        self.generate_dispatch(blocks[:middle], depth + 1, source)
+        source.append("{}else:".format(indent))
+        self.generate_dispatch(blocks[middle:], depth + 1, source)
+
+    def generate_operand(self, oper):
+        return "v_" + oper if isinstance(oper, str) else repr(oper)
+
+    def generate_inst(self, pc, inst):
+        op, opers = inst.op, [self.generate_operand(oper) for oper in inst.opers]
+
+        if op == "HALT":
+            return "return"
+        if op == "JUMP":
+            return "block = {}".format(inst.opers[0])
+        if op == "JMPZ":
+            return "block = {} if {} == 0 else {}".format(inst.opers[0], opers[1], pc + 1)
+        if op == "ITOR":
+            return "{} = float({})".format(opers[0], opers[1])
+        if op == "RTOI":
+            return "{} = int({})".format(opers[0], opers[1])
+
+        kind = op[1:]
+        type_name = QuadProgram.TYPES[op[0]].__name__
+
+        if kind == "ASN":
+            return "{} = {}".format(opers[0], opers[1])
+        if kind == "PRT":
+            return "print_({})".format(opers[0])
+        if kind == "INP":
+            return "{} = read({}, {!r})".format(opers[0], type_name, inst.opers[0])
+
+        symbol = ("//" if op[0] == "I" else "/") if kind == "DIV" else self.BINARY_OPS[kind]
+        return "{} = {} {} {}".format(opers[0], opers[1], symbol, opers[2])
+
+
+ENGINES = {
+    "loop": QuadInterpreter,
+    "closure": ClosureQuadInterpreter,
+    "jit": JitQuadInterpreter,
+}
+
+
+IO_MODES = {
+    "console": lambda: ConsoleIO(),
+    "batch": lambda: BatchIO(sys.stdin, sys.stdout),
+}
+
+
+def benchmark(program, configurations):
+    # Every engine, storage and I/O mode runs with the same input, and its output is discarded
+    stdin_data = sys.stdin.read()
+    stdin, stdout = sys.stdin, sys.stdout
+    timings = []
+
+    for engine, storage, io_mode in configurations:
+        sys.stdin, sys.stdout = io.StringIO(stdin_data), io.StringIO()
+        try:
+            start = timeit.default_timer()
+            interpreter = ENGINES[engine](program, storage=storage, io=IO_MODES[io_mode]())
+            interpreter.run()
+            interpreter.io.flush()
+            timings.append(timeit.default_timer() - start)
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+
+    for (engine, storage, io_mode), timing in zip(configurations, timings):
+        print("{}/{}/{}: {:.3f}s ({:.2f}x)".format(
+            engine, storage, io_mode, timing, timings[0] / timing), file=sys.stderr)
+
 
 def main():
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("source")
     parser.add_argument("-t", "--trace", action="store_true",
                         help="enable tracing")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="loop",
+                        help="execution engine")
+    parser.add_argument("-s", "--storage", choices=sorted(STORAGES), default="namespace",
+                        help="variables storage, slots checks the types once when the program is loaded "
+                             "(programs it cannot check use the namespace)")
+    parser.add_argument("--jit", action="store_const", dest="engine", const="jit",
+                        help="compile the program to a Python function (the same as --engine jit)")
+    parser.add_argument("--jit-cache", default=JitQuadInterpreter.cache_dir,
+                        help="directory of the compiled programs cache, empty to disable it")
+    parser.add_argument("-p", "--profile", action="store_true",
+                        help="print the number of times every op and superinstruction was executed")
+    parser.add_argument("-b", "--batch", action="store_true",
+                        help="read the input values without prompts and buffer the output until the program halts")
+    parser.add_argument("-i", "--input", type=argparse.FileType("r"),
+                        help="read the input values from a file (implies --batch)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time every execution engine and storage on the program, reading the input once from stdin "
+                             "(with --batch, every one of them uses the batch I/O)")
 
     args = parser.parse_args()
 
+    JitQuadInterpreter.cache_dir = args.jit_cache
+
     try:
         with open(args.source, "r") as f:
             program = QuadProgram(f)
 
-        interpreter = QuadInterpreter(program, trace=args.trace)
-        interpreter.run()
+        io_mode = "batch" if args.batch or args.input else "console"
+
+        if args.benchmark:
+            # The baseline always uses the console I/O
+            benchmark(program, [("loop", "namespace", "console")] + [
+                (engine, storage, io_mode)
+                for engine in sorted(ENGINES) for storage in getattr(ENGINES[engine], "STORAGES", sorted(STORAGES))
+                if (engine, storage, io_mode) != ("loop", "namespace", "console")])
+            return 0
+
+        storage = args.storage if args.storage in getattr(ENGINES[args.engine], "STORAGES", STORAGES) else "slots"
+        quad_io = BatchIO(args.input or sys.stdin, sys.stdout) if io_mode == "batch" else ConsoleIO()
+        interpreter = ENGINES[args.engine](program, trace=args.trace, storage=storage, profile=args.profile, io=quad_io)
+        try:
+            interpreter.run()
+        finally:
+            # The buffered output is written even if the program failed, before the error
+            quad_io.flush()
+            if args.profile:
+                interpreter.print_profile()
     except QuadError as e:
         print("{}:{}: error: {}".format(args.source, e.lineno, e.msg), file=sys.stderr)
         return 1
+    except InputError as e:
+        print("{}: error: {}".format(args.source, e), file=sys.stderr)
+        return 1
 
 
 if __name__ == "__main__":